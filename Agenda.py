@@ -0,0 +1,152 @@
+import os
+import sys
+import time
+import bisect
+
+import settings
+import sheetio
+import utils
+from Journal import Journal, journalNames
+
+
+class Agenda:
+
+	# the time tags (<<...>>) of every sheet, without opening them.
+	#
+	# what was found in each sheet is cached in a hidden file next to the
+	#   sheets, along with the modification times of the sheet and its
+	#   journal. update() only reads the sheets that changed since, so with
+	#   lots of sheets starting up is a directory listing and one small json
+	#   read.
+	#
+	# tags are parsed like an open sheet parses them (utils.parseSeconds),
+	#   relative ones ("in 2 hours") from when the sheet was last read.
+
+	cacheVersion = 2
+
+	def __init__(self, sheetDir=None, cacheFile=None):
+		if sheetDir is None:
+			sheetDir = settings.SRC_DIR+'/Sheets'
+		if cacheFile is None:
+			cacheFile = os.path.join(sheetDir, '.agenda.json')
+
+		self.sheetDir = sheetDir
+		self.cacheFile = cacheFile
+
+		# sheet name -> {'stamp': [...], 'items': [[due, id, text], ...]}
+		self.sheets = {}
+
+		# (due, name, id, text) of all sheets, by due time
+		self.items = []
+
+		self.load()
+
+	def load(self):
+		data = utils.jsonLoad(self.cacheFile)
+		if data.get('version') == self.cacheVersion:
+			self.sheets = data['sheets']
+
+	def save(self):
+		data = {'version':self.cacheVersion, 'sheets':self.sheets}
+		utils.jsonSave(data, self.cacheFile, indent=False)
+
+	def update(self):
+		# read the sheets that changed since the cache was written
+		changed = False
+		found = {}
+
+		# one pass over the directory for sheets and journals alike
+		stats = {}
+		sheets = []
+		for entry in os.scandir(self.sheetDir):
+			if not entry.is_file(): continue
+			st = entry.stat()
+			stats[entry.name] = [st.st_mtime_ns, st.st_size]
+
+			# hidden files are journals, temp files, this cache...
+			if not entry.name.startswith('.'):
+				sheets.append(entry)
+
+		for entry in sheets:
+			# changes to a sheet land in its journal first (see Journal.py)
+			stamp = [stats.get(name) for name in (entry.name,)+journalNames(entry.name)]
+
+			cached = self.sheets.get(entry.name)
+			if cached is not None and cached['stamp'] == stamp:
+				found[entry.name] = cached
+				continue
+
+			found[entry.name] = {'stamp':stamp, 'items':self.scan(entry.path)}
+			changed = True
+
+		if changed or len(found) != len(self.sheets):
+			self.sheets = found
+			self.save()
+
+		self.items = sorted(((due, name, index, text)
+				for name, sheet in self.sheets.items() for due, index, text in sheet['items']), key=lambda item: item[0])
+
+	def scan(self, filename):
+		# [[due, thought id, text], ...] of one sheet, snapshot + journal
+		data = Journal(filename).replay(sheetio.load(filename))
+
+		items = []
+		for tData in data.get('thoughts', []):
+			text = tData.get('text', '')
+			timeStr = utils.timeTag(text)
+			if timeStr is None: continue
+
+			due = utils.parseSeconds(timeStr)
+			if due is None: continue
+
+			items.append([due, tData.get('id'), text])
+		return items
+
+	def overdue(self, now=None, limit=20):
+		# most recent first
+		if now is None:
+			now = time.time()
+		i = bisect.bisect_left(self.items, (now,))
+		return self.items[max(0, i-limit):i][::-1]
+
+	def upcoming(self, now=None, limit=20):
+		# soonest first
+		if now is None:
+			now = time.time()
+		i = bisect.bisect_left(self.items, (now,))
+		return self.items[i:i+limit]
+
+	def filename(self, name):
+		return os.path.join(self.sheetDir, name)
+
+
+def describe(item, now=None):
+	# one line for an agenda entry
+	due, name, index, text = item
+
+	# the tag itself is already shown as the time
+	start, end = text.find('<<'), text.find('>>')
+	text = (text[:start]+text[end+2:]).strip()
+	text = ' '.join(text.split())
+	if len(text) > 60:
+		text = text[:57]+'...'
+
+	name = name.replace('.json','').replace(sheetio.BINARY_EXT,'')
+	return '%-10s %-16s %s' % (utils.formatDiff(due, now, short=True), name, text)
+
+
+if __name__ == "__main__":
+	# python3 Agenda.py   (lists the agenda without starting the gui)
+	agenda = Agenda()
+
+	t0 = time.perf_counter()
+	agenda.update()
+	dt = time.perf_counter()-t0
+
+	print("overdue:")
+	for item in agenda.overdue():
+		print("  "+describe(item))
+	print("upcoming:")
+	for item in agenda.upcoming():
+		print("  "+describe(item))
+	print("(%s sheets, %s tags, %.1f ms)" % (len(agenda.sheets), len(agenda.items), 1000*dt), file=sys.stderr)
@@ -0,0 +1,108 @@
+import math
+import time
+import heapq
+import itertools
+
+
+class Tween:
+
+	# one running animation: step(f) gets called once per frame with the
+	#   eased fraction f of the way through (0..1, ending on exactly 1)
+
+	def __init__(self, duration, step, ease, target, done):
+		self.start = time.perf_counter()
+		self.duration = duration
+		self.step = step
+		self.ease = ease
+		self.target = target
+		self.done = done
+
+		self.cancelled = False
+
+	def fraction(self, now):
+		if self.duration <= 0:
+			return 1.0
+		return min(1.0, (now-self.start)/self.duration)
+
+
+class Animator:
+
+	# runs all animations of a window from root.after on the Tk thread,
+	#   instead of a threading.Timer per frame calling into Tk from other
+	#   threads.
+	#
+	# active tweens sit in a heap by when they next want a frame. a tick
+	#   steps the ones that are due, until frameBudget seconds are used up;
+	#   the rest wait for the next tick. tweens go by elapsed time, not frame
+	#   count, so a skipped frame doesn't make an animation run longer.
+
+	frameDelay = 16 # ms
+	frameBudget = 0.008 # seconds of animation work per frame
+
+	def __init__(self, root):
+		self.root = root
+
+		self.heap = [] # (due time, seq, tween)
+		self.seq = itertools.count()
+
+		self.pending = None
+
+	def animate(self, duration, step, ease=None, target=None, done=None):
+		# duration in seconds. target: what the tween draws on, see cancel()
+		if ease is None:
+			ease = linear
+
+		tween = Tween(duration, step, ease, target, done)
+		heapq.heappush(self.heap, (tween.start, next(self.seq), tween))
+		self.schedule()
+		return tween
+
+	def cancel(self, target):
+		# stop the tweens drawing on target (e.g. it was removed), without
+		#   calling their done
+		for due, seq, tween in self.heap:
+			if tween.target is target:
+				tween.cancelled = True
+
+	def schedule(self):
+		if self.pending is not None or not self.heap: return
+
+		delay = max(0, int(1000*(self.heap[0][0]-time.perf_counter())))
+		self.pending = self.root.after(max(delay, 1), self.tick)
+
+	def tick(self):
+		self.pending = None
+
+		t0 = time.perf_counter()
+		try:
+			while self.heap and self.heap[0][0] <= t0:
+				if time.perf_counter()-t0 > self.frameBudget: break
+
+				due, seq, tween = heapq.heappop(self.heap)
+				if tween.cancelled: continue
+
+				f = tween.fraction(time.perf_counter())
+				tween.step(tween.ease(f))
+
+				if f < 1.0:
+					heapq.heappush(self.heap, (t0+self.frameDelay/1000.0, next(self.seq), tween))
+				elif tween.done is not None:
+					tween.done()
+		finally:
+			# one failing tween shouldn't stop the others
+			self.schedule()
+
+
+# easing functions, fraction of time -> fraction of the way
+
+def linear(f):
+	return f
+
+def bounce(f):
+	# up and back down again (0 -> 1 -> 0), the jump thoughts do when the
+	#   mouse goes over them. this is the position you get from moving by
+	#   -atan(2*(2f-1)) per step, scaled to peak at 1
+	def g(v):
+		return -(v*math.atan(v) - 0.5*math.log(1+v*v))/4.0
+
+	return (g(2*(2*f-1))-g(-2))/(g(0)-g(-2))
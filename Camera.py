@@ -0,0 +1,55 @@
+
+class Camera:
+
+	# maps world coordinates (what thoughts are stored in) to screen pixels:
+	#
+	#   screen = world*scale + offset
+	#
+	# panning/zooming only changes the camera, never the thoughts. the scale
+	#   is base*zoomFac**level with an integer level, so zooming in and back
+	#   out lands exactly on the old scale instead of drifting
+
+	zoomFac = 1.05
+
+	def __init__(self, offset=(0.0, 0.0), base=1.0, level=0):
+		self.offset = (offset[0], offset[1])
+		self.base = base
+		self.level = level
+
+		self.scale = self.base*self.zoomFac**self.level
+
+	def toScreen(self, p):
+		return (p[0]*self.scale+self.offset[0], p[1]*self.scale+self.offset[1])
+
+	def toWorld(self, p):
+		return ((p[0]-self.offset[0])/self.scale, (p[1]-self.offset[1])/self.scale)
+
+	def pan(self, delta):
+		# delta in screen pixels
+		self.offset = (self.offset[0]+delta[0], self.offset[1]+delta[1])
+
+	def zoomAt(self, direction, location):
+		# zoom one step in/out, keeping the world point under location
+		#   (screen pixels) where it is
+		w = self.toWorld(location)
+
+		if direction == "in":
+			self.level += 1
+		else:
+			self.level -= 1
+		self.scale = self.base*self.zoomFac**self.level
+
+		self.offset = (location[0]-w[0]*self.scale, location[1]-w[1]*self.scale)
+
+	def toData(self):
+		return {'offset':list(self.offset), 'base':self.base, 'level':self.level}
+
+
+def fromData(data):
+	# camera saved with a sheet. older sheets only have a 'zoom', with their
+	#   thoughts stored in screen pixels ('pixLoc') at that zoom
+	cam = data.get('camera')
+	if cam is None:
+		return Camera(base=data.get('zoom') or 1.0)
+
+	return Camera(offset=cam['offset'], base=cam['base'], level=cam['level'])
@@ -0,0 +1,170 @@
+import tkinter as tk
+
+import markup
+from utils import toHex
+
+
+class Editor:
+
+	# the one text box of a sheet. thoughts draw their text on the canvas
+	#   (see ThoughtView.layoutText), when one gets clicked the editor is
+	#   laid over it until the focus moves elsewhere, then the text is
+	#   written back to the thought.
+	#
+	# while typing only the centring is redone on each key. the thought
+	#   looks at the new text (markup, colour, time tag, journal) once the
+	#   keys stop for typingDelay ms.
+
+	typingDelay = 120 # ms
+
+	def __init__(self, sheet):
+		self.sheet = sheet
+		self.root = sheet.root
+		self.fonts = sheet.fonts
+
+		self.thought = None # thought being edited
+
+		# the text is styled with one tag per style in markup.py, configured
+		#   with the font it currently stands for
+		self.tagFonts = {}
+		self.baseFont = None
+
+		# markup lines the tags were last set for, see style()
+		self.styledLines = []
+
+		self.pendingTyping = None # after id of the deferred Thought.typing
+
+		self.text = tk.Text(self.root, bd=0, highlightthickness=0, wrap="word")
+		self.text.tag_configure("center", justify='center')
+
+		# bind to release instea of press so that we can look
+		# at the most recently typed text
+		self.text.bind('<KeyRelease>', self.typing)
+		self.text.bind('<FocusOut>', self.commit)
+
+		# cutting and pasting can put the same text back without its tags
+		for sequence in ('<<Cut>>', '<<Paste>>', '<<Clear>>'):
+			self.text.bind(sequence, self.replaced)
+
+	def attach(self, thought):
+		if thought is self.thought:
+			self.text.focus()
+			return
+
+		self.commit()
+		if thought.view is None: return
+
+		self.thought = thought
+
+		self.text.delete("1.0", tk.END)
+		self.styledLines = []
+		self.text.insert(tk.END, thought.text)
+		self.text.tag_add("center", 1.0, "end")
+
+		thought.view.hideText()
+
+		self.style()
+		self.place()
+		self.text.focus()
+
+	def commit(self, event=[]):
+		# hand the text back to the thought being edited
+		t = self.thought
+		if t is None: return
+
+		# catch up with the last keys while the text is still in the box
+		self.flushTyping()
+
+		t.text = self.getText()
+		self.thought = None
+
+		self.text.place_forget()
+
+		if t.view is not None:
+			t.view.showText()
+			t.layoutText()
+
+	def getText(self):
+		text = self.text.get("0.0",tk.END)
+		text = text.strip()
+		return text
+
+	def typing(self, event):
+		if self.thought is None: return
+
+		self.text.tag_add("center", 1.0, "end")
+
+		# emptied boxes don't get styled (there's nothing to colour), so
+		#   forget the old lines before anything gets typed back in
+		if self.text.get("1.0", "end-1c") == "":
+			self.replaced()
+
+		# a newer key makes what was scheduled for the last one stale
+		if self.pendingTyping is not None:
+			self.root.after_cancel(self.pendingTyping)
+		self.pendingTyping = self.root.after(self.typingDelay, self.typed, self.thought, event)
+
+	def typed(self, thought, event):
+		self.pendingTyping = None
+		if thought is not self.thought: return
+
+		thought.typing(event)
+
+	def replaced(self, event=None):
+		# the box content was replaced, style() has to look at every line
+		self.styledLines = []
+
+	def flushTyping(self):
+		if self.pendingTyping is None: return
+
+		self.root.after_cancel(self.pendingTyping)
+		self.pendingTyping = None
+		self.thought.typing(None)
+
+	def place(self):
+		if self.thought is None: return
+
+		x0, y0, x1, y1 = self.thought.textBox()
+		self.text.place(x=x0, y=y0, width=x1-x0, height=y1-y0)
+
+	def style(self):
+		# same fonts/colours as the thought draws its text with
+		t = self.thought
+		if t is None: return
+
+		insertbg=[v*0.5+w*0.5 for v,w in zip(t.textColour, t.cs.def_thought)]
+		self.text.configure(fg=toHex(t.textColour), insertbackground=toHex(insertbg), bg=toHex(t.colour))
+
+		# what's in the box, not stripped like getText, so that the lines
+		#   and columns match the widget's
+		m = markup.parse(self.text.get("1.0", "end-1c"))
+
+		# zooming or another weight only changes what the tags look like
+		fonts = t.fonts(m.weight)
+		if fonts['base'] != self.baseFont:
+			self.text.configure(font=self.fonts.acquire(fonts['base']))
+			if self.baseFont is not None:
+				self.fonts.release(self.baseFont)
+			self.baseFont = fonts['base']
+		for name in markup.styles[1:]:
+			old = self.tagFonts.get(name)
+			if old != fonts[name]:
+				self.text.tag_config(name, font=self.fonts.acquire(fonts[name]))
+				if old is not None:
+					self.fonts.release(old)
+				self.tagFonts[name] = fonts[name]
+
+		# only retag the lines that changed since last time
+		for pos, entry in enumerate(m.lines):
+			if pos < len(self.styledLines) and self.styledLines[pos] == entry: continue
+
+			line, half, spans = entry
+			for name in markup.styles[1:]:
+				self.text.tag_remove(name, '%s.0'%(pos+1), '%s.end'%(pos+1))
+
+			for start, end, kind in spans:
+				name = markup.style(kind, half)
+				if name == 'base': continue
+				self.text.tag_add(name, '%s.%s'%(pos+1,start), '%s.%s'%(pos+1, end))
+
+		self.styledLines = m.lines
@@ -0,0 +1,75 @@
+import tkinter.font as tkfont
+from collections import OrderedDict
+
+
+class FontRegistry:
+
+	# named Tk fonts, one per (family, size, weight), shared by everything
+	#   that draws text. handing Tk a font object instead of a
+	#   (family, size, weight) tuple saves resolving the font again on
+	#   every configure.
+	#
+	# users acquire() the fonts they keep on screen and release() them
+	#   when they switch to another one. fonts nobody uses any more are kept
+	#   for a while (zooming back tends to need them again), the least
+	#   recently used go once there are more than maxUnused.
+
+	maxUnused = 64
+
+	def __init__(self, root):
+		self.root = root
+
+		self.fonts = {} # key -> tkfont.Font
+		self.refs = {} # key -> number of users
+		self.unused = OrderedDict() # keys without users, oldest first
+
+	def key(self, font):
+		# font: (family, size[, weight]) with weight 'normal', 'bold' or 'italic'
+		weight = font[2] if len(font) > 2 else 'normal'
+		return (font[0], int(font[1]), weight)
+
+	def get(self, font):
+		# the font without holding on to it (e.g. for measuring)
+		key = self.key(font)
+		f = self.fonts.get(key)
+		if f is not None:
+			if key in self.unused:
+				self.unused.move_to_end(key)
+			return f
+
+		family, size, weight = key
+		if weight == 'italic':
+			f = tkfont.Font(root=self.root, family=family, size=size, slant='italic')
+		else:
+			f = tkfont.Font(root=self.root, family=family, size=size, weight=weight)
+
+		self.fonts[key] = f
+		self.refs[key] = 0
+		self.unused[key] = True
+		self.evict()
+
+		return f
+
+	def acquire(self, font):
+		f = self.get(font)
+		key = self.key(font)
+		self.refs[key] += 1
+		self.unused.pop(key, None)
+		return f
+
+	def release(self, font):
+		key = self.key(font)
+		if self.refs.get(key, 0) <= 0: return
+
+		self.refs[key] -= 1
+		if self.refs[key] == 0:
+			self.unused[key] = True
+			self.evict()
+
+	def evict(self):
+		# Tk keeps a deleted font alive for widgets still showing it, so
+		#   this is safe even for a font something still draws with
+		while len(self.unused) > self.maxUnused:
+			key, _ = self.unused.popitem(last=False)
+			del self.fonts[key]
+			del self.refs[key]
@@ -0,0 +1,102 @@
+
+from SpatialIndex import SpatialIndex
+
+
+class GraphStore:
+
+	# holds the thoughts and links of a sheet, indexed so that lookups don't
+	#   need to walk every thought/link:
+	#   - thoughts : thought index -> Thought (kept in insertion order)
+	#   - incident : thought index -> set of links touching that thought
+	#   - edges    : normalized (min index, max index) -> Link
+	#   - thoughtIndex/linkIndex : where they are in world coordinates (see
+	#     SpatialIndex.py), kept up to date through moved()
+
+	def __init__(self):
+		self.thoughts = {}
+		self.incident = {}
+		self.edges = {}
+
+		self.thoughtIndex = SpatialIndex()
+		self.linkIndex = SpatialIndex()
+
+	def edgeKey(self, a, b):
+		# links are undirected as far as duplicates are concerned
+		if a <= b:
+			return (a, b)
+		return (b, a)
+
+	def addThought(self, thought):
+		self.thoughts[thought.index] = thought
+		self.incident[thought.index] = set()
+		self.thoughtIndex.insert(thought, thought.bounds())
+
+	def getThought(self, index):
+		return self.thoughts.get(index)
+
+	def removeThought(self, index):
+		# returns the links that were attached to the thought so the caller can
+		#   clean up their drawings
+		links = self.incident.pop(index, set())
+		for l in links:
+			self._dropLink(l, skip=index)
+
+		thought = self.thoughts.pop(index, None)
+		if thought is not None:
+			self.thoughtIndex.remove(thought)
+
+		return links
+
+	def addLink(self, link):
+		key = self.edgeKey(link.tA.index, link.tB.index)
+		if key in self.edges:
+			return False
+
+		self.edges[key] = link
+		self.incident[link.tA.index].add(link)
+		self.incident[link.tB.index].add(link)
+		self.linkIndex.insert(link, self.linkBounds(link))
+		return True
+
+	def hasLink(self, a, b):
+		return self.edgeKey(a, b) in self.edges
+
+	def removeLink(self, a, b):
+		link = self.edges.get(self.edgeKey(a, b))
+		if link is not None:
+			self._dropLink(link)
+		return link
+
+	def _dropLink(self, link, skip=None):
+		self.edges.pop(self.edgeKey(link.tA.index, link.tB.index), None)
+		self.linkIndex.remove(link)
+
+		for i in (link.tA.index, link.tB.index):
+			if i != skip and i in self.incident:
+				self.incident[i].discard(link)
+
+	def linkBounds(self, link):
+		(xa, ya), (xb, yb) = link.tA.pos, link.tB.pos
+		return (min(xa, xb), min(ya, yb), max(xa, xb), max(ya, yb))
+
+	def moved(self, thought):
+		# thought changed position or size
+		if thought.index not in self.thoughts: return
+
+		self.thoughtIndex.update(thought, thought.bounds())
+		for l in self.incident[thought.index]:
+			self.linkIndex.update(l, self.linkBounds(l))
+
+	def inBox(self, box):
+		# (thoughts, links) overlapping a box in world coordinates
+		return self.thoughtIndex.query(box), self.linkIndex.query(box)
+
+	def linksOf(self, thought):
+		# links touching the given thought, O(degree)
+		return self.incident.get(thought.index, ())
+
+	def thoughtList(self):
+		return self.thoughts.values()
+
+	def linkList(self):
+		return self.edges.values()
@@ -0,0 +1,65 @@
+import time
+from collections import deque
+
+
+class InputCoalescer:
+
+	# pointer motion while dragging (panning, moving/resizing thoughts,
+	#   dragging font sizes) comes in faster than it can be drawn on a big
+	#   sheet. instead of running the drag handler for every motion event,
+	#   only the latest event per handler is kept and the handler runs once
+	#   per frame with it. the handlers work out their delta from the last
+	#   position they saw, so the whole accumulated movement gets applied.
+	#
+	# the time from the first event of a batch to the frame that drew it
+	#   is kept, see latency().
+
+	def __init__(self, root, renderer):
+		self.root = root
+		self.renderer = renderer
+
+		self.pending = {} # handler -> (latest event, time of first event)
+		self.scheduled = None
+
+		# recent input-to-draw latencies (seconds)
+		self.latencies = deque(maxlen=200)
+
+	def add(self, handler, event):
+		# use for <B*-Motion> bindings instead of calling handler(event)
+		old = self.pending.get(handler)
+		t0 = old[1] if old is not None else time.perf_counter()
+		self.pending[handler] = (event, t0)
+
+		# idle callbacks only run once Tk has no events queued up
+		if self.scheduled is None:
+			self.scheduled = self.root.after_idle(self.apply)
+
+	def apply(self):
+		self.scheduled = None
+
+		pending, self.pending = self.pending, {}
+		for handler, (event, t0) in pending.items():
+			handler(event)
+
+		if pending:
+			first = min(t0 for event, t0 in pending.values())
+			self.renderer.whenDrawn(lambda: self.latencies.append(time.perf_counter()-first))
+
+	def flush(self):
+		# apply what's pending right away (e.g. before a button release, so
+		#   the drag ends where the pointer is)
+		if self.scheduled is not None:
+			self.root.after_cancel(self.scheduled)
+		self.apply()
+
+	def discard(self, obj):
+		# obj (a thought) is gone, drop motion for its handlers
+		for handler in list(self.pending):
+			if getattr(handler, '__self__', None) is obj:
+				del self.pending[handler]
+
+	def latency(self):
+		# (mean, worst) input-to-draw latency in ms over recent drags
+		if not self.latencies:
+			return (0.0, 0.0)
+		return (1000.0*sum(self.latencies)/len(self.latencies), 1000.0*max(self.latencies))
@@ -0,0 +1,393 @@
+import os
+import json
+import queue
+import threading
+
+import Camera
+
+
+class Journal:
+
+	# append-only log of changes made to a sheet since its last snapshot.
+	#
+	# every change is a small json record on its own line, tagged with an
+	#   increasing sequence number. snapshots (the sheet file itself) store the
+	#   sequence number of the last record they include ('journalSeq'), so on
+	#   load only the newer records are replayed on top of the snapshot.
+	#
+	# records (thoughts are referred to by their id/index, positions are in
+	#   world coordinates):
+	#   add    : id, pos, radius, text, fontSize
+	#   move   : id, pos
+	#   resize : id, radius, fontSize
+	#   text   : id, text
+	#   remove : id
+	#   link   : a, b, importance
+	#   unlink : a, b
+	#   camera : camera (pan/zoom, as in Camera.toData)
+
+	# once the journal grows past this many bytes it gets folded into a
+	#   fresh snapshot
+	compactSize = 256*1024
+
+	# the file itself is only ever touched by a JournalWriter thread, so the
+	#   appends (and their fsync) never hold up the Tk main loop
+
+	def __init__(self, filename):
+		directory, name = os.path.split(os.path.abspath(filename))
+
+		current, old = journalNames(name)
+		self.filename = os.path.join(directory, current)
+		# journal being folded into a snapshot that hasn't landed yet
+		self.oldFilename = os.path.join(directory, old)
+
+		# records not written yet, coalesced so that dragging a thought
+		#   around only leaves its final position behind
+		self.pending = {}
+
+		self.file = None # writer thread only
+		self.writer = None # started on the first write
+
+		# carry on after the records already on disk, anything recorded
+		#   before the loader gets to them mustn't reuse their seqs
+		self.seq = max((rec['seq'] for rec in self.records()), default=0)
+
+	def record(self, op, key=None, **fields):
+		# key: records with the same key replace each other until flushed
+		#   (they must be absolute, e.g. a position rather than a delta)
+		fields['op'] = op
+
+		if key is None:
+			key = len(self.pending)
+			while key in self.pending: key += 1
+		else:
+			key = (op, key)
+			# move to the end so it stays ordered after anything recorded since
+			self.pending.pop(key, None)
+
+		self.pending[key] = fields
+
+	def flush(self, done=None):
+		# done(error), if given, gets called on the writer thread once
+		#   everything recorded so far is on disk (error is None) or
+		#   writing it failed
+		text = None
+		if self.pending:
+			lines = []
+			for rec in self.pending.values():
+				self.seq += 1
+				rec['seq'] = self.seq
+				lines.append(json.dumps(rec))
+			self.pending = {}
+
+			text = '\n'.join(lines)+'\n'
+
+		if done is None:
+			if text is not None:
+				self.do(lambda: self.append(text))
+			return
+
+		def write():
+			try:
+				if text is not None:
+					self.append(text)
+			except Exception as e:
+				done(e)
+			else:
+				done(None)
+		self.do(write)
+
+	def do(self, fn):
+		# run fn on the writer thread, after everything handed over before
+		if self.writer is None:
+			self.writer = JournalWriter()
+		self.writer.do(fn)
+
+	def sync(self):
+		# wait for the writer thread to catch up
+		if self.writer is not None:
+			self.writer.sync()
+
+	def append(self, text):
+		if self.file is None:
+			self.file = open(self.filename, 'a')
+			# a crash can leave a torn last line, start on a fresh one so the
+			#   next record doesn't get glued to it
+			if self.file.tell() > 0 and not endsWithNewline(self.filename):
+				text = '\n'+text
+
+		self.file.write(text)
+		self.file.flush()
+		os.fsync(self.file.fileno())
+
+	def size(self):
+		try:
+			return os.path.getsize(self.filename)
+		except OSError:
+			return 0
+
+	def needsCompaction(self):
+		return self.size() > self.compactSize
+
+	def rotate(self):
+		# called when a snapshot including everything up to self.seq has been
+		#   taken: start a fresh journal and keep the old one around until
+		#   the snapshot is safely on disk
+		self.flush()
+		self.do(self.rotateFiles)
+
+	def rotateFiles(self):
+		self.closeFile()
+
+		if not os.path.exists(self.filename): return
+
+		if os.path.exists(self.oldFilename):
+			# an earlier compaction never landed, keep its records too
+			with open(self.oldFilename, 'a') as old, open(self.filename) as cur:
+				if old.tell() > 0 and not endsWithNewline(self.oldFilename):
+					old.write('\n')
+				old.write(cur.read())
+			os.remove(self.filename)
+		else:
+			os.replace(self.filename, self.oldFilename)
+
+	def dropOld(self):
+		# the snapshot made at rotate() time has landed
+		def remove():
+			if os.path.exists(self.oldFilename):
+				os.remove(self.oldFilename)
+		self.do(remove)
+
+	def close(self):
+		# blocks until everything handed to the writer is on disk
+		self.flush()
+		if self.writer is not None:
+			self.do(self.closeFile)
+			self.sync()
+
+	def closeFile(self):
+		if self.file is not None:
+			self.file.close()
+			self.file = None
+
+	def read(self, afterSeq=0):
+		# records newer than afterSeq, oldest first. a torn last line (crash
+		#   mid-append) is ignored
+		self.sync()
+
+		records = [rec for rec in self.records() if rec['seq'] > afterSeq]
+		records.sort(key=lambda rec: rec['seq'])
+
+		if records:
+			self.seq = max(self.seq, records[-1]['seq'])
+		self.seq = max(self.seq, afterSeq)
+
+		return records
+
+	def records(self):
+		# every intact record in .old and the current journal, in file order
+		for fn in (self.oldFilename, self.filename):
+			if not os.path.exists(fn): continue
+
+			with open(fn) as f:
+				for line in f:
+					try:
+						rec = json.loads(line)
+					except ValueError:
+						continue
+					if isinstance(rec, dict) and 'seq' in rec:
+						yield rec
+
+	def patch(self, afterSeq=0):
+		# the changes newer than afterSeq, folded so that they can be applied
+		#   to snapshot thoughts/links one at a time (see JournalPatch)
+		return JournalPatch(self.read(afterSeq=afterSeq))
+
+	def replay(self, data):
+		# apply the journal on top of snapshot data (as stored in the sheet
+		#   file), returns the updated data
+		if data == {}:
+			data = {'thoughts':[], 'links':[]}
+
+		patch = self.patch(afterSeq=data.get('journalSeq', 0))
+		if patch.empty():
+			return data
+
+		return patch.applyTo(data)
+
+
+class JournalWriter:
+
+	# a thread running a journal's file operations one after the other, in
+	#   the order they were handed over
+
+	def __init__(self):
+		self.queue = queue.Queue()
+
+		self.thread = threading.Thread(target=self.run, daemon=True)
+		self.thread.start()
+
+	def do(self, fn):
+		self.queue.put(fn)
+
+	def run(self):
+		while True:
+			fn = self.queue.get()
+			try:
+				fn()
+			except Exception as e:
+				print("ERROR: writing journal failed:", e)
+			finally:
+				self.queue.task_done()
+
+	def sync(self):
+		self.queue.join()
+
+
+class JournalPatch:
+
+	# journal records folded into their end result, so a loader can patch
+	#   snapshot entries as it streams them instead of needing the whole
+	#   snapshot in memory first.
+
+	def __init__(self, records):
+		self.records = len(records)
+		self.lastSeq = 0
+
+		self.camera = None # last camera record, if any
+
+		self.changed = {} # id -> {field: value}
+		self.added = {} # id -> thought data, in the order they were added
+		self.removed = set()
+		self.links = {} # linkKey -> (a, b, importance), or None if unlinked
+
+		for rec in records:
+			self.fold(rec)
+			self.lastSeq = rec['seq']
+
+	def empty(self):
+		return self.records == 0
+
+	def fold(self, rec):
+		op = rec['op']
+
+		if op == 'add':
+			index = rec['id']
+			self.added[index] = {'id':index, 'pos':rec['pos'], 'radius':rec['radius'],
+					'text':rec['text'], 'fontSize':rec['fontSize']}
+			# an id can come back after it was removed, nothing recorded for
+			#   the thought that had it before carries over
+			self.removed.discard(index)
+			self.changed.pop(index, None)
+			for key in [key for key in self.links if index in key]:
+				del self.links[key]
+		elif op in ('move', 'resize', 'text'):
+			fields = self.changed.setdefault(rec['id'], {})
+			for field in ('pos', 'radius', 'fontSize', 'text'):
+				if field in rec:
+					fields[field] = rec[field]
+		elif op == 'remove':
+			self.removed.add(rec['id'])
+			self.added.pop(rec['id'], None)
+		elif op == 'link':
+			self.links[linkKey(rec['a'], rec['b'])] = (rec['a'], rec['b'], rec['importance'])
+		elif op == 'unlink':
+			self.links[linkKey(rec['a'], rec['b'])] = None
+		elif op == 'camera':
+			self.camera = rec['camera']
+
+	def position(self, index, pos):
+		# final world position of a snapshot thought stored at pos
+		fields = self.changed.get(index)
+		if fields is not None and 'pos' in fields:
+			return fields['pos']
+		return pos
+
+	def thought(self, tData):
+		# patched copy of a snapshot thought, None if it was removed since
+		index = tData['id']
+		if index in self.removed:
+			return None
+
+		tData = dict(tData)
+		tData.update(self.changed.get(index, {}))
+		return tData
+
+	def addedThoughts(self):
+		for index in self.added:
+			tData = dict(self.added[index])
+			tData.update(self.changed.get(index, {}))
+			yield tData
+
+	def keepLink(self, a, b):
+		# whether a snapshot link between thoughts a and b survives (if it
+		#   was unlinked and linked again, addedLinks has the new one)
+		if a in self.removed or b in self.removed:
+			return False
+		return linkKey(a, b) not in self.links
+
+	def addedLinks(self):
+		# links created since the snapshot
+		for link in self.links.values():
+			if link is None: continue
+			a, b, importance = link
+			if a in self.removed or b in self.removed: continue
+			yield link
+
+	def applyTo(self, data):
+		# snapshot dict -> patched snapshot dict (in world coordinates, even
+		#   if the snapshot predates them)
+		camera = Camera.fromData(data)
+
+		thoughts = []
+		positionId = []
+		for i, t in enumerate(data['thoughts']):
+			t = dict(t)
+			t.setdefault('id', i+1)
+			if 'pos' not in t:
+				t['pos'] = list(camera.toWorld(t.pop('pixLoc')))
+			positionId.append(t['id'])
+
+			t = self.thought(t)
+			if t is not None:
+				thoughts.append(t)
+
+		thoughts.extend(self.addedThoughts())
+
+		position = {}
+		for i, t in enumerate(thoughts):
+			position[t['id']] = i+1
+
+		links = []
+		for l in data['links']:
+			a, b = positionId[l['tA']-1], positionId[l['tB']-1]
+			if self.keepLink(a, b):
+				links.append({'tA':position[a], 'tB':position[b], 'importance':l['importance']})
+
+		for a, b, importance in self.addedLinks():
+			links.append({'tA':position[a], 'tB':position[b], 'importance':importance})
+
+		data = dict(data)
+		data.pop('zoom', None)
+		data['camera'] = self.camera or camera.toData()
+		data['thoughts'] = thoughts
+		data['links'] = links
+		data['journalSeq'] = self.lastSeq
+
+		return data
+
+
+def journalNames(name):
+	# (journal, old journal) file names for the sheet file name. hidden files
+	#   next to the sheet, so the wrapper doesn't list them
+	return ('.'+name+'.journal', '.'+name+'.journal.old')
+
+def endsWithNewline(filename):
+	with open(filename, 'rb') as f:
+		f.seek(-1, os.SEEK_END)
+		return f.read(1) == b'\n'
+
+def linkKey(a, b):
+	if a <= b:
+		return (a, b)
+	return (b, a)
@@ -1,5 +1,4 @@
 import utils
-import threading
 
 class Link:
 
@@ -7,6 +6,9 @@ class Link:
 	length=0.0
 	z_length=0.0
 
+	# off-screen links keep their line hidden and skip updates
+	visible=True
+
 
 	def __init__(self, parentSheet, tA, tB, importance):
 		self.root=parentSheet.root
@@ -72,7 +74,9 @@ class Link:
 		tags = kwargs.setdefault("tags", [])
 		tags.append(layer_tag)
 		item_id = command(coords, **kwargs)
-		self._adjust_layers()
+		# in bulk mode the sheet restacks all layers once at the end
+		if not self.parentSheet.bulk:
+			self._adjust_layers()
 		return item_id
 
 	def _adjust_layers(self, readjust=False):
@@ -96,7 +100,19 @@ class Link:
 			'''
 
 
+	def hide(self):
+		self.visible = False
+		self.canvas.itemconfig(self.canvasIndex, state='hidden')
+
+	def show(self):
+		self.visible = True
+		self.canvas.itemconfig(self.canvasIndex, state='normal')
+		self.setZooms()
+		self.updateLine()
+
 	def updateLine(self):
+		if not self.visible: return
+
 		x0,y0,x1,y1 = self.getCoords()
 
 		#xb0,yb0,xb1,yb1 = self.getHeadCoords()
@@ -110,6 +126,7 @@ class Link:
 	def remove(self, event=[]):
 		self.parentSheet.pausePanning = True
 
+		self.parentSheet.animator.cancel(self)
 		self.canvas.delete(self.canvasIndex)
 		#self.canvas.delete(self.canvasIndex2)
 
@@ -120,17 +137,12 @@ class Link:
 
 		self.parentSheet.pausePanning = False
 
-	def grow(self, stage=0):
+	def grow(self):
 		
 
-		if self.parentSheet.fastGraphics: return
-
-		total_stages=10
-
-		f = 1.0*stage/total_stages
-
-		if stage<=total_stages:
+		if self.parentSheet.fastGraphics or self.parentSheet.bulk: return
 
+		def step(f):
 			x0,y0,x1,y1 = self.getCoords()
 
 			x1p = (1.0-f)*x0 + f*x1
@@ -141,14 +153,7 @@ class Link:
 			w = self.z_width*f
 			self.canvas.itemconfig(self.canvasIndex, width=int(w))
 
-		self.root.update()
-
-		if stage < total_stages:
-			t = threading.Timer(0.02, self.grow, [stage+1])
-			t.daemon = True
-			t.start()
-			#time.sleep(0.005)
-			#self.grow(max_width, stage+1)
+		self.parentSheet.animator.animate(0.2, step, target=self)
 
 	def getCoords(self, dFrac=0.5):
 		x0,y0,x1,y1 = self.tA.pixLoc[0], self.tA.pixLoc[1], self.tB.pixLoc[0], self.tB.pixLoc[1]
@@ -172,9 +177,9 @@ class Link:
 		return (x0p, y0p, x1p, y1p)
 
 
-	def zoom(self, direction):
+	def zoom(self):
 		self.setZooms()
-		self.updateLine()
+		self.parentSheet.renderer.markLink(self)
 
 	def isImportant(self):
 		return self.importance==1
\ No newline at end of file
@@ -0,0 +1,86 @@
+import time
+
+
+class RenderScheduler:
+
+	# collects the thoughts/links that need redrawing and redraws them once,
+	#   from the main loop, instead of straight from every event handler.
+	#
+	# a thought dragged around (and its links) is marked on every motion
+	#   event but only redrawn once per frame, however many events came in.
+	#   at most maxPerFrame items are redrawn per frame, the rest wait for
+	#   the next one so input keeps getting handled.
+
+	maxPerFrame = 300
+	frameDelay = 16 # ms between frames while there is a backlog
+
+	def __init__(self, root, onFrame=None):
+		self.root = root
+
+		# called with the time each frame took
+		self.onFrame = onFrame
+
+		# dicts used as ordered sets, thought -> fromZoom
+		self.thoughts = {}
+		self.links = {}
+
+		self.pending = None
+
+		# run once everything marked so far has been drawn
+		self.drawnCallbacks = []
+
+	def markThought(self, thought, fromZoom=False):
+		self.thoughts[thought] = self.thoughts.get(thought, False) or fromZoom
+		self.schedule()
+
+	def markLink(self, link):
+		self.links[link] = True
+		self.schedule()
+
+	def whenDrawn(self, fn):
+		self.drawnCallbacks.append(fn)
+		self.schedule()
+
+	def discard(self, item):
+		# item is gone, don't draw it
+		self.thoughts.pop(item, None)
+		self.links.pop(item, None)
+
+	def schedule(self, delay=0):
+		if self.pending is not None: return
+
+		if delay == 0:
+			self.pending = self.root.after_idle(self.flush)
+		else:
+			self.pending = self.root.after(delay, self.flush)
+
+	def flush(self, limit=None):
+		self.pending = None
+		if limit is None:
+			limit = self.maxPerFrame
+
+		t0 = time.perf_counter()
+
+		# thoughts first, links are drawn between them
+		n = 0
+		while self.thoughts and n < limit:
+			thought = next(iter(self.thoughts))
+			fromZoom = self.thoughts.pop(thought)
+			thought.reDraw(fromZoom=fromZoom)
+			n += 1
+
+		while self.links and not self.thoughts and n < limit:
+			link = next(iter(self.links))
+			del self.links[link]
+			link.updateLine()
+			n += 1
+
+		if self.onFrame is not None and n > 0:
+			self.onFrame(time.perf_counter()-t0)
+
+		if self.thoughts or self.links:
+			self.schedule(self.frameDelay)
+		else:
+			callbacks, self.drawnCallbacks = self.drawnCallbacks, []
+			for fn in callbacks:
+				fn()
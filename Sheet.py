@@ -1,10 +1,25 @@
 
-import threading
+import os
+import time
 from Thought import Thought
+from ThoughtView import ThoughtView
+from Editor import Editor
+from RenderScheduler import RenderScheduler
+from InputCoalescer import InputCoalescer
+from Animator import Animator
+from TimeKeeper import TimeKeeper
+from FontRegistry import FontRegistry
 from Link import Link
+from GraphStore import GraphStore
+from SheetWriter import SheetWriter
+from Journal import Journal
+from SheetLoader import SheetLoader
+from Camera import Camera
+from SpatialIndex import overlaps
 
 import settings
 import utils
+import sheetio
 from utils import toHex, shadeN
 import ColourScheme as cs
 
@@ -19,27 +34,86 @@ class Sheet:
 	linkA, linkB = -1,-1
 	linkImportance=-1
 
-	# zoom factor
-	zoomFac = 1.05
-	curZoom= 1.0
-
 	# turn on/off animations
 	fastGraphics = False
 
+	# bulk construction (loading/importing lots of thoughts): no animations,
+	#   focus changes or per-item restacking, see beginBulk()
+	bulk = False
+
 	holding=False
 
+	# changes aren't journaled while the sheet itself is being loaded
+	loading=False
+	# SheetLoader while the sheet file is still coming in
+	loader=None
+
+	# ms to gather changes before appending them to the journal
+	journalDelay = 300
+
+	# pixels around the window that are still drawn, so short pans don't
+	#   show thoughts popping in at the edges
+	cullMargin = 200
+
+	# views (canvas items + text box) of thoughts that went off screen are
+	#   kept for reuse, up to this many
+	poolSize = 200
+
+	# level of detail: shadows are left out below this zoom, or while pans/
+	#   zooms take longer than frameBudget seconds (until they are back
+	#   under half of it)
+	shadowMinZoom = 0.4
+	frameBudget = 1.0/30
+	overBudget = False
+
+	# a burst of wheel ticks only scales what's drawn, the thoughts are
+	#   redrawn at their new size (fonts and all) once no tick came in for
+	#   this many ms
+	zoomSettleDelay = 150
+	zoomPending = None
+
 	def __init__(self, root, canvas, filename):
 		self.root=root
 		self.canvas=canvas
 
 		self.cs=cs.ColourScheme()
 
-		self.thoughts = []
-		self.links = []
+		# thoughts/links live in an indexed store (see GraphStore.py)
+		self.graph = GraphStore()
+
+		# thoughts are kept in world coordinates, panning and zooming only
+		#   moves the camera (see Camera.py)
+		self.camera = Camera()
+
+		# what is drawn right now, everything else has its items hidden
+		#   (see updateVisible)
+		self.visibleThoughts = set()
+		self.visibleLinks = set()
+
+		# spare thought views, see acquireView
+		self.viewPool = []
+
+		# Tk fonts shared by all text drawn on the sheet
+		self.fonts = FontRegistry(self.root)
+
+		# text box for whichever thought is being edited
+		self.editor = Editor(self)
+
+		# redraws asked for by event handlers, done once per frame
+		self.renderer = RenderScheduler(self.root, onFrame=self.frameDone)
+
+		# drag motion is applied once per frame (see InputCoalescer.py)
+		self.input = InputCoalescer(self.root, self.renderer)
+
+		# all animations run from here, on the Tk thread
+		self.animator = Animator(self.root)
+
+		# countdown labels of time tagged thoughts
+		self.timeKeeper = TimeKeeper(self.root)
 
 		self.canvas.bind("<Double-Button-1>",self.addAtCoord)
 		self.canvas.bind('<Button-1>', self.startDrag)
-		self.canvas.bind('<B1-Motion>', self.onDrag)
+		self.canvas.bind('<B1-Motion>', lambda event : self.input.add(self.onDrag, event))
 		self.canvas.bind('<ButtonRelease-1>', self.endThoughtDrag)
 		self.root.bind('<Control-Key-s>', self.saveData)
 
@@ -51,6 +125,17 @@ class Sheet:
 		self.curIndex=0 #keep track of index most recently assigned (first thought=1)
 
 		self.filename=filename
+		# 'json' or 'binary', kept when the sheet is written back
+		self.fileFormat = sheetio.formatOf(filename)
+
+		# files are written on a worker thread, see SheetWriter.py
+		self.writer = SheetWriter(self.root)
+
+		# every change is appended to a journal, the sheet file itself only
+		#   gets rewritten when the journal is compacted (see Journal.py)
+		self.journal = Journal(self.filename)
+		self.journalFlushPending = False
+		self.compacting = False
 
 		self.imageList=[]
 
@@ -62,6 +147,18 @@ class Sheet:
 
 		self.loadFile()
 
+	@property
+	def thoughts(self):
+		return self.graph.thoughtList()
+
+	@property
+	def links(self):
+		return self.graph.linkList()
+
+	@property
+	def curZoom(self):
+		return self.camera.scale
+
 	def initDrawing(self):
 		# draw the save button
 		
@@ -74,10 +171,14 @@ class Sheet:
 
 
 	def startDrag(self, event):
+		# clicking the background ends editing
+		self.editor.commit()
+
 		self.dragInit = (event.x, event.y)
 		self.cursorPos = (event.x, event.y)
 
 	def endThoughtDrag(self, event):
+		self.input.flush()
 		self.pausePanning = False
 		self.root.update()
 
@@ -88,42 +189,140 @@ class Sheet:
 
 			self.cursorPos = (event.x, event.y)
 
-			for t in self.thoughts:
-				t.moveByPix((delta[0],delta[1]))
-			for l in self.links:
-				l.updateLine()
+			t0 = time.perf_counter()
+			self.panBy(delta)
+			self.recordCamera()
+			self.frameDone(time.perf_counter()-t0)
+
+	def panBy(self, delta):
+		# only the camera moves. everything drawn (text included) shifts
+		#   with one canvas.move instead of redrawing every thought and link
+		self.camera.pan(delta)
+
+		self.canvas.move("all", delta[0], delta[1])
+		# screen-fixed items (progress label etc.) stay where they are
+		self.canvas.move("overlay", -delta[0], -delta[1])
+
+		self.editor.place()
+
+		self.updateVisible()
 
 	def zoom(self, direction="in", event=[]):
 	
-		if direction == "in":
-			self.curZoom *= self.zoomFac
-		else:
-			self.curZoom /= self.zoomFac
+		location=(event.x, event.y)
 
+		oldScale = self.camera.scale
+		self.camera.zoomAt(direction, location)
+		self.recordCamera()
 
 		#print "zooming ", direction, self.curZoom
 
-		location=(event.x, event.y)
+		if self.zoomPending is None:
+			# shadow images don't scale, leave them out until it settles
+			for t in self.visibleThoughts:
+				if t.view is not None:
+					t.view.showShadow(False)
+		else:
+			self.root.after_cancel(self.zoomPending)
 
-		for t in self.thoughts:
+		# everything drawn moves/grows with one canvas.scale, like panBy.
+		#   line widths and fonts stay as they are for now
+		f = self.camera.scale/oldScale
+		self.canvas.scale("all", location[0], location[1], f, f)
+		# screen-fixed items (progress label etc.) stay where they are
+		self.canvas.scale("overlay", location[0], location[1], 1.0/f, 1.0/f)
+
+		self.editor.place()
+
+		self.zoomPending = self.root.after(self.zoomSettleDelay, self.zoomSettled)
+
+		self.updateVisible()
+
+	def zoomSettled(self):
+		self.zoomPending = None
+
+		# only what's on screen, the rest catches up when it gets shown
+		for t in self.visibleThoughts:
 			# change size of t
-			t.zoom(direction, location)
+			t.zoom()
+
+		for l in self.visibleLinks:
+			l.zoom()
+
+	def zooming(self):
+		return self.zoomPending is not None
+
+	def showShadows(self):
+		return self.camera.scale >= self.shadowMinZoom and not self.overBudget and not self.zooming()
+
+	def frameDone(self, frameTime):
+		# switch shadows off while frames are slow, back on once they're fast
+		shadowsWere = self.showShadows()
+
+		if frameTime > self.frameBudget:
+			self.overBudget = True
+		elif frameTime < self.frameBudget/2:
+			self.overBudget = False
+
+		if self.showShadows() != shadowsWere:
+			for t in self.visibleThoughts:
+				self.renderer.markThought(t)
+
+	def viewBox(self):
+		# part of the world on screen (plus margin)
+		m = self.cullMargin
+		x0, y0 = self.camera.toWorld((-m, -m))
+		x1, y1 = self.camera.toWorld((self.root.winfo_width()+m, self.root.winfo_height()+m))
+		return (x0, y0, x1, y1)
+
+	def updateVisible(self):
+		# show what came into view, hide what left it. only the thoughts and
+		#   links near the view are looked at (see SpatialIndex.py)
+		thoughts, links = self.graph.inBox(self.viewBox())
+
+		for t in self.visibleThoughts - thoughts:
+			t.hide()
+		for l in self.visibleLinks - links:
+			l.hide()
+
+		for t in thoughts - self.visibleThoughts:
+			t.show()
+		for l in links - self.visibleLinks:
+			l.show()
+
+		self.visibleThoughts = thoughts
+		self.visibleLinks = links
+
+	def acquireView(self):
+		if self.viewPool:
+			return self.viewPool.pop()
+		return ThoughtView(self)
+
+	def releaseView(self, view):
+		if len(self.viewPool) < self.poolSize:
+			view.hide()
+			self.viewPool.append(view)
+		else:
+			view.destroy()
 
-		for l in self.links:
-			l.updateLine()
-			l.zoom(direction)
+	def thoughtMoved(self, t):
+		# position or size of t changed
+		self.graph.moved(t)
 
 
 	def loadFile(self):
-		data = utils.jsonLoad(self.filename)
-		
-		if data == {}:
-			return
+		# thoughts are created a batch at a time from the main loop, see
+		#   SheetLoader.py
+		self.loader = SheetLoader(self)
+		self.loader.start()
 
+	def applyView(self, camera, geom=None):
+		# restore the camera and window geometry saved with the sheet
+		self.camera = camera
 
-		self.curZoom = data['zoom']
+		if geom is None:
+			return
 
-		geom = data['root_geometry']
 		#geom = geom.split('+')[0]+'+0+0'
 		#self.root.geometry(geom)
 		
@@ -139,66 +338,114 @@ class Sheet:
 		self.root.update()
 		self.resize()
 
-		for t in data['thoughts']:
-			self.addThought(coords=t['pixLoc'], data=t)
+	def loadDone(self):
+		self.loader = None
+
+		self.updateVisible()
+
+		self.lowerLinks()
+
+		self.root.update()
+
+	def beginBulk(self):
+		# call around code creating many thoughts/links at once (the sheet
+		#   loader, imports), finish with endBulk()
+		self.bulk = True
 
-		for l in data['links']:
-			self.linkA = l['tA']
-			self.linkB = l['tB']
-			self.linkImportance = l['importance']
-			self.addLink()
+	def endBulk(self):
+		self.bulk = False
 
 	def saveData(self, event=[]):
 		#print "saving..."
-		pixelX=self.root.winfo_width()
-		pixelY=self.root.winfo_height()
+		#"1097x499+94+212"
+		# changes are already in the journal, so saving only has to append
+		#   the last few. the sheet file is rewritten when the journal gets
+		#   long (or doesn't exist yet). either way the pulse only comes
+		#   once the write has landed
+		if self.canCompact() and (not os.path.exists(self.filename) or self.journal.needsCompaction()):
+			self.compact(pulse=True)
+		else:
+			self.journal.flush(done=self.writer.track(self.journalSaved))
 
-		oX = self.root.winfo_rootx()
-		oY = self.root.winfo_rooty()
-		data = {}
-		data['root_geometry'] = self.root.winfo_geometry() #[pixelX, pixelY, oX, oY]
+		return
 
-		#"1097x499+94+212"
+	def journalSaved(self, worked):
+		if worked:
+			self.pulse()
 
+	def canCompact(self):
+		# a snapshot taken halfway through loading would lose thoughts
+		return not self.compacting and self.loader is None
 
-		data['thoughts'] = []
+	def compact(self, pulse=False):
+		# fold the journal into a fresh snapshot, written in the background
+		self.compacting = True
 
-		data['zoom'] = self.curZoom
+		self.journal.flush()
 
-		for t in self.thoughts:
-	
-			tData={}
-			#tData['index'] = t.index
-			tData['pixLoc'] = t.pixLoc
-			tData['radius'] = t.r
-			tData['text'] = t.getText()
-			tData['fontSize'] = t.fontSize
+		# the snapshot is taken here on the main thread, the writer only ever
+		#   sees plain data
+		data = sheetio.serialize(geometry=self.root.winfo_geometry(), camera=self.camera,
+				thoughts=self.thoughts, links=self.links, journalSeq=self.journal.seq)
 
-			data['thoughts'].append(tData)
+		self.journal.rotate()
 
+		self.writer.save(data, self.filename, callback=lambda worked: self.compactDone(worked, pulse),
+				writeFn=sheetio.writerFor(self.fileFormat))
 
-		data['links'] = []
-		for l in self.links:
-	
-			lData={}
-			#need to add 1 since index assignments for thoughts starts at 1
-			#   instead of 0
-			lData['tA'] = self.thoughts.index(l.tA)+1
-			lData['tB'] = self.thoughts.index(l.tB)+1
-			lData['importance'] = l.importance
+	def compactDone(self, worked, pulse):
+		# called once the snapshot has really been written
+		self.compacting = False
 
+		if worked:
+			self.journal.dropOld()
+			if pulse:
+				self.pulse()
 
-			data['links'].append(lData)
+	def record(self, op, key=None, **fields):
+		# add a change to the journal, it gets written out shortly after
+		if self.loading: return
 
-			#l.grow()
+		self.journal.record(op, key, **fields)
+		self.scheduleJournalFlush()
 
-	
-		utils.jsonSave(data=data, filename=self.filename, indent=True, sort=False, oneLine=False)
-		
+	def recordCamera(self):
+		# until the saved view is applied the camera is a default one, which
+		#   mustn't end up in the journal over the saved one
+		if not self.loaderPrepared(): return
 
-		self.pulse()
+		self.record('camera', key='camera', camera=self.camera.toData())
 
-		return
+	def recordMove(self, t):
+		self.record('move', key=t.index, id=t.index, pos=list(t.pos))
+
+	def recordResize(self, t):
+		self.record('resize', key=t.index, id=t.index, radius=t.r, fontSize=t.fontSize)
+
+	def recordText(self, t):
+		self.record('text', key=t.index, id=t.index, text=t.getText())
+
+	def scheduleJournalFlush(self):
+		if self.journalFlushPending: return
+
+		self.journalFlushPending = True
+		self.root.after(self.journalDelay, self.flushJournal)
+
+	def flushJournal(self):
+		self.journalFlushPending = False
+
+		self.journal.flush()
+
+		if self.canCompact() and self.journal.needsCompaction():
+			self.compact()
+
+	def close(self):
+		# make sure every change is on disk before the window goes away,
+		#   including the thought being edited and keys not handled yet
+		self.editor.commit()
+		self.journal.flush()
+		self.writer.wait()
+		self.journal.close()
 
 
 	def groupShift(self, node, delta, shiftType=0, level=0):
@@ -217,7 +464,8 @@ class Sheet:
 			damp=1.0
 			delta2 = [v*damp for v in list(delta)]
 		
-			for l in self.links:
+			# only the links touching node can pull anything along
+			for l in list(self.graph.linksOf(node)):
 				#if not l.isImportant(): continue
 
 				if l.isImportant() and node == l.tA and not l.tB.groupShifted:
@@ -228,6 +476,7 @@ class Sheet:
 
 					l.tB.moveBy(delta2)
 					l.tB.groupShifted=True
+					self.recordMove(l.tB)
 					#if level < 1:
 					self.groupShift(l.tB, delta2, shiftType, level=level+1)
 					#else:
@@ -248,7 +497,7 @@ class Sheet:
 					#	self.groupShift(l.tA, delta2, shiftType=1, level=level+1)
 				'''
 
-				l.updateLine()
+				self.renderer.markLink(l)
 					
 
 		elif shiftType==1:	
@@ -270,8 +519,8 @@ class Sheet:
 						t.groupShifted=True
 						self.groupShift(t, delta, shiftType)
 
-			for l in self.links:
-				l.updateLine()
+			for l in self.visibleLinks:
+				self.renderer.markLink(l)
 
 		elif shiftType==2:	
 			for t in self.thoughts:
@@ -295,8 +544,8 @@ class Sheet:
 						t.groupShifted=True
 						self.groupShift(t, delta2, shiftType)
 
-			for l in self.links:
-				l.updateLine()
+			for l in self.visibleLinks:
+				self.renderer.markLink(l)
 		
 
 
@@ -318,9 +567,31 @@ class Sheet:
 
 		self.saveIcon.place(x=0, y=pixelY-30, width=30, height=30)
 
+		self.updateVisible()
+
 	def addThought(self, coords, data={}):
 
-		self.thoughts.append(Thought(self, coords, data))
+		# a new thought needs a fresh id, which isn't known until the loader
+		#   has seen every id in the file. it gets added once they are
+		if 'id' not in data and not self.loaderPrepared():
+			self.loader.queue(coords, dict(data))
+			return None
+
+		t = Thought(self, coords, data)
+		self.graph.addThought(t)
+
+		# off-screen thoughts don't get drawn until they come into view
+		if overlaps(t.bounds(), self.viewBox()):
+			t.show()
+			self.visibleThoughts.add(t)
+
+			# don't jump the focus around while loading a whole sheet
+			if not self.bulk:
+				self.editor.attach(t)
+
+		self.record('add', id=t.index, pos=list(t.pos), radius=t.r, text=t.getText(), fontSize=t.fontSize)
+
+		return t
 
 		#self.saveData()
 
@@ -336,18 +607,18 @@ class Sheet:
 		# remove any links connected to that thought
 		
 
-		T = self.getThought(index)
+		t = self.getThought(index)
+		self.visibleThoughts.discard(t)
+		self.renderer.discard(t)
+		self.input.discard(t)
 
-		n = len(self.links)
-		for i in range(n):
-			l = self.links[n - i - 1]
-			if l.tA == T or l.tB == T:
-				#print "removing"
-				l.remove()
-				#self.removeLink(l.tA, l.tB)
+		for l in self.graph.removeThought(index):
+			#print "removing"
+			self.visibleLinks.discard(l)
+			self.renderer.discard(l)
+			l.remove()
 
-
-		self.thoughts.remove(T)
+		self.record('remove', id=index)
 
 		self.root.update()
 
@@ -357,13 +628,22 @@ class Sheet:
 	def removeLink(self, tA, tB):
 		# remove link associated with tA and tB
 
-		for l in self.links:
-			if l.tA == tA and l.tB==tB:
-				self.links.remove(l)
-				
-				break
+		link = self.graph.removeLink(tA.index, tB.index)
+		if link is not None:
+			self.visibleLinks.discard(link)
+			self.renderer.discard(link)
+			self.record('unlink', a=tA.index, b=tB.index)
+
+	def loaderPrepared(self):
+		# the ids in the file and the saved view are known (see SheetLoader.prepare)
+		return self.loader is None or self.loader.prepared
+
+	def getNewIndex(self, index=None):
+		# index: keep the id a thought was saved with
+		if index is not None:
+			self.curIndex = max(self.curIndex, index)
+			return index
 
-	def getNewIndex(self):
 		self.curIndex += 1
 		return self.curIndex
 
@@ -378,41 +658,41 @@ class Sheet:
 			print("ERROR: a link end not assigned")
 
 		if tA != tB and not self.hasLink(tA, tB):
-			self.links.append(Link(self, self.getThought(tA), self.getThought(tB), importance=self.linkImportance))
+			self.linkThoughts(tA, tB, self.linkImportance)
 
 			#print "Creating a link!"
 
 		# set circle colour back to white
 		TA = self.getThought(tA)
-		TA.canvas.itemconfig(TA.smallCircleIndex, fill=toHex(self.cs.smallCircle))
+		if TA.view is not None:
+			TA.canvas.itemconfig(TA.smallCircleIndex, fill=toHex(self.cs.smallCircle))
 
 		# reset link assignments
 		self.resetLinkData()
 
 		self.lowerLinks()
 
+	def linkThoughts(self, tA, tB, importance):
+		# link thoughts with indices tA and tB
+		link = Link(self, self.getThought(tA), self.getThought(tB), importance=importance)
+		self.graph.addLink(link)
+
+		if overlaps(self.graph.linkBounds(link), self.viewBox()):
+			self.visibleLinks.add(link)
+		else:
+			link.hide()
+		self.record('link', a=tA, b=tB, importance=importance)
+		return link
+
 	def getThought(self, index):
-		for t in self.thoughts:
-			if t.index == index:
-				return t
+		return self.graph.getThought(index)
 
 	def updateNodeEdges(self, node):
-		for l in self.links:
-	
-			if node == l.tA or node == l.tB:
-			
-				l.updateLine()		
+		for l in self.graph.linksOf(node):
+			self.renderer.markLink(l)
 
 	def hasLink(self, tA, tB):
-
-		TA = self.getThought(tA)
-		TB = self.getThought(tB)
-
-		for l in self.links:
-
-			if (l.tA == TA and l.tB==TB) or (l.tA == TB and l.tB==TA):
-				return True
-		return False
+		return self.graph.hasLink(tA, tB)
 
 	def resetLinkData(self):
 		self.linkA = -1
@@ -420,32 +700,20 @@ class Sheet:
 		self.linkImportance=-1
 
 	def lowerLinks(self):
-		# make sure all the softer links are lower than the white ones
+		# make sure all the softer links are lower than the white ones, and
+		#   the shadows below all links (whole layers at once, via tags)
 
-		for l in self.links:
-			l._adjust_layers(readjust=True)
+		self.canvas.lower("layer 1")
+		self.canvas.lower("layer 0")
 
-		for t in self.thoughts:
-			t.lowerShadows()
+		self.canvas.lower("shadow")
 
 
-	def pulse(self, stage=0):
-		
-		#try:
-
-		total_stages=20
-
-		f = 1.0*stage/total_stages
-		
-		if stage<=total_stages:
+	def pulse(self):
+		# flash the background (after saving)
+		def step(f):
 			bkgColour = shadeN([self.cs.background, self.cs.backgroundPulse, self.cs.background], [0,0.5,1], f)
 			
 			self.canvas.configure(bg=toHex(bkgColour))
 
-
-		if stage < total_stages:
-			t = threading.Timer(0.01, self.pulse, [stage+1])
-			t.daemon = True
-			t.start()
-		#except:
-		#	pass
\ No newline at end of file
+		self.animator.animate(0.2, step, target=self.canvas)
\ No newline at end of file
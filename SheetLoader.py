@@ -0,0 +1,275 @@
+import os
+
+import sheetio
+import Camera
+from utils import toHex, shadeN
+
+
+class SheetLoader:
+
+	# loads a sheet file in small steps scheduled with root.after, so the
+	#   window shows up (and stays usable) while a big sheet comes in:
+	#
+	#   1. parse the file a chunk at a time (json is streamed, binary sheets
+	#      are memory-mapped and only their position columns are read)
+	#   2. apply the journal and sort the thoughts by distance from the
+	#      middle of the saved view
+	#   3. create thoughts in batches, nearest first, then the links. this
+	#      runs in the sheet's bulk mode (no animations, focus changes or
+	#      restacking per item), links/shadows get restacked once at the end
+	#
+	# a small progress label sits in the corner of the canvas meanwhile.
+
+	parseBatch = 2000 # json elements parsed per step
+	batchSize = 50 # thoughts or links created per step
+	stepDelay = 1 # ms between steps, lets Tk handle input and redraws
+
+	def __init__(self, sheet, onDone=None):
+		self.sheet = sheet
+		self.root = sheet.root
+		self.canvas = sheet.canvas
+		self.filename = sheet.filename
+
+		self.onDone = onDone
+
+		self.meta = {}
+		self.thoughts = [] # json: thought dicts in file order
+		self.links = [] # json: link dicts in file order
+		self.binary = None # binary: BinarySheet
+
+		# set once the ids used in the file and journal are known, see prepare()
+		self.prepared = False
+		self.queued = [] # (coords, data) of thoughts added before that
+
+		self.progressIndex = None
+		self.done = 0
+		self.total = 0
+
+	def start(self):
+		if sheetio.isBinary(self.filename):
+			try:
+				self.binary = sheetio.BinarySheet(self.filename)
+			except (OSError, ValueError):
+				self.finish()
+				return
+
+			# only the placeholders for thoughts/links are in meta
+			self.meta = dict(self.binary.meta)
+			self.prepare()
+			return
+
+		if os.path.exists(self.filename):
+			self.events = sheetio.iterJson(self.filename)
+		else:
+			# no file yet, there might still be a journal
+			self.events = iter(())
+
+		self.schedule(self.parseStep)
+
+	def schedule(self, step):
+		self.root.after(self.stepDelay, step)
+
+	def parseStep(self):
+		try:
+			for i in range(self.parseBatch):
+				kind, key, value = next(self.events)
+				if kind == 'value':
+					self.meta[key] = value
+				elif key == 'thoughts':
+					self.thoughts.append(value)
+				elif key == 'links':
+					self.links.append(value)
+		except StopIteration:
+			self.prepare()
+			return
+		except (OSError, ValueError) as e:
+			print("ERROR: could not read sheet:", e)
+			self.thoughts, self.links = [], []
+			self.prepare()
+			return
+
+		self.setProgress("reading... %s" % len(self.thoughts))
+		self.schedule(self.parseStep)
+
+	def prepare(self):
+		self.patch = self.sheet.journal.patch(afterSeq=self.meta.get('journalSeq') or 0)
+
+		# camera the file was saved with, used to bring old style screen
+		#   positions into world coordinates. the journal may have moved it
+		self.fileCamera = Camera.fromData(self.meta)
+		camera = self.fileCamera
+		if self.patch.camera is not None:
+			camera = Camera.fromData({'camera':self.patch.camera})
+
+		self.sheet.applyView(camera, self.meta.get('root_geometry'))
+
+		# ids of the thoughts in file order (older files don't store them,
+		#   those thoughts are numbered by position)
+		if self.binary is not None:
+			n = self.binary.numThoughts
+			self.ids = [i+1 if self.binary.flags[i] & sheetio.F_NO_ID else self.binary.ids[i] for i in range(n)]
+		else:
+			n = len(self.thoughts)
+			self.ids = [t.get('id', i+1) for i, t in enumerate(self.thoughts)]
+
+		# new thoughts made while the rest is still loading must not get the
+		#   id of one that hasn't come in yet, nor one the journal has seen
+		#   (even if it was removed since)
+		journalIds = list(self.patch.added)+list(self.patch.removed)+list(self.patch.changed)
+		self.sheet.curIndex = max([self.sheet.curIndex]+self.ids+journalIds)
+		self.prepared = True
+
+		self.addQueued()
+
+		# nearest to the middle of the view first
+		cx = self.root.winfo_width()/2.0
+		cy = self.root.winfo_height()/2.0
+
+		order = []
+		for i in range(n):
+			if self.ids[i] in self.patch.removed: continue
+			x, y = camera.toScreen(self.patch.position(self.ids[i], self.position(i)))
+			order.append(((x-cx)*(x-cx) + (y-cy)*(y-cy), i))
+		order.sort()
+
+		self.order = [i for d, i in order]
+		self.added = list(self.patch.addedThoughts())
+
+		self.total = len(self.order)+len(self.added)
+		self.done = 0
+		self.pos = 0
+
+		self.schedule(self.thoughtStep)
+
+	def position(self, i):
+		# world position of the i-th thought in the file
+		if self.binary is not None:
+			loc = (self.binary.x[i], self.binary.y[i])
+			if self.binary.flags[i] & sheetio.F_POS:
+				return loc
+		else:
+			if 'pos' in self.thoughts[i]:
+				return self.thoughts[i]['pos']
+			loc = self.thoughts[i]['pixLoc']
+
+		return self.fileCamera.toWorld(loc)
+
+	def thoughtData(self, i):
+		if self.binary is not None:
+			tData = self.binary.thought(i)
+		else:
+			tData = self.thoughts[i]
+		tData['id'] = self.ids[i]
+		if 'pos' not in tData:
+			tData['pos'] = self.fileCamera.toWorld(tData['pixLoc'])
+
+		return self.patch.thought(tData)
+
+	def thoughtStep(self):
+		sheet = self.sheet
+		sheet.loading = True
+		sheet.beginBulk()
+
+		for k in range(self.batchSize):
+			if self.pos < len(self.order):
+				tData = self.thoughtData(self.order[self.pos])
+			elif self.pos < self.total:
+				tData = self.added[self.pos-len(self.order)]
+			else:
+				break
+
+			sheet.addThought(coords=None, data=tData)
+			self.pos += 1
+
+		sheet.endBulk()
+		sheet.loading = False
+
+		self.done = self.pos
+		self.setProgress("loading... %s/%s" % (self.done, self.total))
+
+		if self.pos < self.total:
+			self.schedule(self.thoughtStep)
+		else:
+			self.linkList = self.collectLinks()
+			self.pos = 0
+			self.schedule(self.linkStep)
+
+	def collectLinks(self):
+		# (a, b, importance) by thought id
+		links = []
+		if self.binary is not None:
+			for i in range(self.binary.numLinks):
+				links.append((self.ids[self.binary.tA[i]-1], self.ids[self.binary.tB[i]-1], self.binary.importance[i]))
+		else:
+			for l in self.links:
+				links.append((self.ids[l['tA']-1], self.ids[l['tB']-1], l['importance']))
+
+		links = [l for l in links if self.patch.keepLink(l[0], l[1])]
+		links.extend(self.patch.addedLinks())
+
+		return links
+
+	def linkStep(self):
+		sheet = self.sheet
+		sheet.loading = True
+		sheet.beginBulk()
+
+		end = min(self.pos+self.batchSize, len(self.linkList))
+		for a, b, importance in self.linkList[self.pos:end]:
+			# the user may have deleted a thought while we were loading
+			if sheet.getThought(a) is None or sheet.getThought(b) is None: continue
+			if a == b or sheet.hasLink(a, b): continue
+			sheet.linkThoughts(a, b, importance)
+		self.pos = end
+
+		sheet.endBulk()
+		sheet.loading = False
+
+		self.setProgress("linking... %s/%s" % (self.pos, len(self.linkList)))
+
+		if self.pos < len(self.linkList):
+			self.schedule(self.linkStep)
+		else:
+			self.finish()
+
+	def finish(self):
+		if self.binary is not None:
+			self.binary.close()
+			self.binary = None
+
+		self.thoughts, self.links = [], []
+
+		if self.progressIndex is not None:
+			self.canvas.delete(self.progressIndex)
+			self.progressIndex = None
+
+		self.sheet.loadDone()
+
+		# the file couldn't be read, so prepare() may not have run
+		self.addQueued()
+
+		if self.onDone is not None:
+			self.onDone()
+
+	def queue(self, coords, data):
+		# a thought added before prepare(), see Sheet.addThought
+		self.queued.append((coords, data))
+
+	def addQueued(self):
+		queued, self.queued = self.queued, []
+		for coords, data in queued:
+			self.sheet.addThought(coords, data)
+
+	def setProgress(self, text):
+		x = self.root.winfo_width()-10
+		y = self.root.winfo_height()-10
+
+		if self.progressIndex is None:
+			cs = self.sheet.cs
+			self.progressIndex = self.canvas.create_text(x, y, anchor='se', text=text, tags="overlay",
+				fill=toHex(shadeN([cs.background, cs.lightText], [0,1], 0.54)))
+		else:
+			self.canvas.coords(self.progressIndex, x, y)
+			self.canvas.itemconfig(self.progressIndex, text=text)
+
+		self.canvas.tag_raise(self.progressIndex)
@@ -0,0 +1,129 @@
+import threading
+import queue
+
+import utils
+
+
+class SheetWriter:
+
+	# writes sheet data to disk on a worker thread so that saving never
+	#   blocks the Tk main loop.
+	#
+	# - the caller hands over an already built snapshot (plain dicts/lists),
+	#   so the worker never touches Tk or live Thought objects
+	# - if a file is saved again before its previous request was picked up,
+	#   the older snapshot is dropped and only the newest one gets written
+	# - callbacks run back on the main thread (polled with root.after) once
+	#   the file really is on disk
+
+	pollDelay = 50 # ms between checks for finished writes
+
+	def __init__(self, root):
+		self.root = root
+
+		self.cond = threading.Condition()
+		self.pending = {} # filename -> (data, callbacks, writeFn)
+		self.busy = 0 # requests handed over but not reported back yet
+		self.finished = queue.Queue()
+
+		self.polling = False
+		self.closed = False
+
+		self.thread = threading.Thread(target=self._run, daemon=True)
+		self.thread.start()
+
+	def save(self, data, filename, callback=None, writeFn=None):
+		# writeFn(data, filename) does the actual (atomic) write
+		if writeFn is None:
+			writeFn = utils.jsonSave
+
+		with self.cond:
+			callbacks = []
+			if filename in self.pending:
+				# coalesce with the request that hasn't started yet
+				callbacks = self.pending[filename][1]
+			else:
+				self.busy += 1
+
+			if callback is not None:
+				callbacks.append(callback)
+
+			self.pending[filename] = (data, callbacks, writeFn)
+			self.cond.notify()
+
+		self._schedulePoll()
+
+	def track(self, callback):
+		# for writes done by some other thread (the journal's): returns
+		#   done(error) for that thread to call when it's finished, then
+		#   callback(worked) runs on the main thread like the ones of save()
+		with self.cond:
+			self.busy += 1
+
+		self._schedulePoll()
+
+		return lambda error: self.finished.put(([callback], error))
+
+	def _run(self):
+		while True:
+			with self.cond:
+				while not self.pending:
+					self.cond.wait()
+
+				filename = next(iter(self.pending))
+				data, callbacks, writeFn = self.pending.pop(filename)
+
+			error = None
+			try:
+				writeFn(data, filename)
+			except Exception as e:
+				error = e
+
+			self.finished.put((callbacks, error))
+
+	def _schedulePoll(self):
+		if self.polling or self.closed: return
+		self.polling = True
+		self.root.after(self.pollDelay, self._poll)
+
+	def _poll(self):
+		self.polling = False
+		self._report()
+
+		if self.busy > 0:
+			self._schedulePoll()
+
+	def _report(self):
+		# run callbacks of finished writes (main thread only)
+		while True:
+			try:
+				callbacks, error = self.finished.get_nowait()
+			except queue.Empty:
+				return
+
+			with self.cond:
+				self.busy -= 1
+
+			if error is not None:
+				print("ERROR: saving failed:", error)
+
+			for cb in callbacks:
+				cb(error is None)
+
+	def wait(self):
+		# block until everything handed over is on disk (used when exiting)
+		while True:
+			with self.cond:
+				if self.busy == 0:
+					break
+			try:
+				callbacks, error = self.finished.get(timeout=0.1)
+			except queue.Empty:
+				continue
+
+			with self.cond:
+				self.busy -= 1
+			if error is not None:
+				print("ERROR: saving failed:", error)
+
+		self.closed = True
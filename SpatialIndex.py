@@ -0,0 +1,99 @@
+
+class SpatialIndex:
+
+	# uniform grid over world coordinates, for finding what lies in a
+	#   rectangle (e.g. the part of the sheet that is on screen) without
+	#   looking at everything.
+	#
+	# items are any hashable objects, each with a bounding box
+	#   (x0, y0, x1, y1) that gets registered in every cell it overlaps.
+	#   items spanning a lot of cells (very long links) are kept aside and
+	#   checked on every query instead of filling the grid.
+
+	cellSize = 400.0 # world units
+	maxCells = 64
+
+	def __init__(self, cellSize=None):
+		if cellSize is not None:
+			self.cellSize = cellSize
+
+		self.cells = {} # (cx, cy) -> set of items
+		self.boxes = {} # item -> (box, cell range, or None if large)
+		self.large = set()
+
+	def cellRange(self, box):
+		s = self.cellSize
+		return (int(box[0]//s), int(box[1]//s), int(box[2]//s), int(box[3]//s))
+
+	def insert(self, item, box):
+		cr = self.cellRange(box)
+		if (cr[2]-cr[0]+1)*(cr[3]-cr[1]+1) > self.maxCells:
+			self.large.add(item)
+			self.boxes[item] = (box, None)
+			return
+
+		for cx in range(cr[0], cr[2]+1):
+			for cy in range(cr[1], cr[3]+1):
+				self.cells.setdefault((cx, cy), set()).add(item)
+		self.boxes[item] = (box, cr)
+
+	def remove(self, item):
+		entry = self.boxes.pop(item, None)
+		if entry is None: return
+
+		box, cr = entry
+		if cr is None:
+			self.large.discard(item)
+			return
+
+		for cx in range(cr[0], cr[2]+1):
+			for cy in range(cr[1], cr[3]+1):
+				cell = self.cells.get((cx, cy))
+				if cell is None: continue
+				cell.discard(item)
+				if not cell:
+					del self.cells[(cx, cy)]
+
+	def update(self, item, box):
+		entry = self.boxes.get(item)
+		if entry is not None and entry[1] is not None and entry[1] == self.cellRange(box):
+			# still in the same cells, only the box changed
+			self.boxes[item] = (box, entry[1])
+			return
+
+		self.remove(item)
+		self.insert(item, box)
+
+	def query(self, box):
+		# items whose box overlaps the given one
+		found = set()
+
+		cr = self.cellRange(box)
+		if (cr[2]-cr[0]+1)*(cr[3]-cr[1]+1) > len(self.cells):
+			# zoomed far out: walking the occupied cells is cheaper
+			cells = [c for k, c in self.cells.items() if cr[0] <= k[0] <= cr[2] and cr[1] <= k[1] <= cr[3]]
+		else:
+			cells = []
+			for cx in range(cr[0], cr[2]+1):
+				for cy in range(cr[1], cr[3]+1):
+					cell = self.cells.get((cx, cy))
+					if cell is not None:
+						cells.append(cell)
+
+		for cell in cells:
+			for item in cell:
+				if item not in found and overlaps(self.boxes[item][0], box):
+					found.add(item)
+
+		for item in self.large:
+			if overlaps(self.boxes[item][0], box):
+				found.add(item)
+
+		return found
+
+	def __len__(self):
+		return len(self.boxes)
+
+
+def overlaps(a, b):
+	return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
@@ -1,13 +1,13 @@
 
-import tkinter as tk
 import math
 import subprocess
 import time
-import threading
-import tkinter as tk
 
 import settings
 import utils
+import shadows
+import markup
+import Animator
 from utils import toHex, shadeN
 
 class Thought:
@@ -32,6 +32,9 @@ class Thought:
 
 	pulsePause = False
 
+	# how far up the thought is drawn while jumping (see pulse)
+	lift = 0
+
 
 	curZoom = 1.0
 
@@ -48,12 +51,17 @@ class Thought:
 	labelFontSize=8
 	hasTime=False
 
+	# off-screen thoughts have no view (canvas items + text box, see
+	#   ThoughtView.py) and skip redraws
+	visible=False
+	view=None
+
 	def __init__(self, parentSheet, coords, data={}):
 		self.root=parentSheet.root
 		self.canvas=parentSheet.canvas
 
 		self.parentSheet = parentSheet
-		self.index=parentSheet.getNewIndex() #index of thought on sheet (in case we want to delete later)
+		self.index=parentSheet.getNewIndex(data.get('id')) #index of thought on sheet (in case we want to delete later)
 		
 		self.cs = parentSheet.cs
 		self.textColour=self.cs.lightText # will soon make set to optimal value
@@ -66,8 +74,12 @@ class Thought:
 			
 
 
-		self.loc=(1.0*coords[0]/self.root.winfo_width(), 1.0*coords[1]/self.root.winfo_height())
-		self.pixLoc=(coords[0], coords[1])
+		# position in world coordinates (see Camera.py), coords are screen
+		#   pixels of a new thought
+		if 'pos' in data:
+			self.pos = (data['pos'][0], data['pos'][1])
+		else:
+			self.pos = self.parentSheet.camera.toWorld(coords)
 
 		self.text = ""
 		if data != {}:
@@ -85,6 +97,77 @@ class Thought:
 		
 		
 
+	def bounds(self):
+		# box in world coordinates around everything drawn for the thought
+		#   (ring, time label above, shadow below)
+		x, y = self.pos
+		r = self.r + self.ringSpacing[0] + self.smallRad
+		return (x-r, y-r-2*self.labelFontSize, x+r, y+r+self.height)
+
+	def attach(self, view):
+		# take over a (hidden) view from the sheet's pool and style it
+		view.owner = self
+		self.view = view
+
+		self.pulseCircleIndex = view.pulseCircle
+		self.mainCircleIndex = view.mainCircle
+		self.mainRingIndex = view.mainRing
+		self.labelIndex = view.label
+		self.smallCircleIndex = view.smallCircle
+		self.shadowIndex = view.shadow
+
+		view.show()
+
+		if self.curZoom != self.parentSheet.curZoom:
+			self.setZooms()
+
+		self.recolour()
+		self.updateFont()
+		self.updateLabel()
+		self.canvas.itemconfig(self.smallCircleIndex, fill=toHex(self.cs.smallCircle))
+		self.canvas.itemconfig(self.mainRingIndex, width=self.z_ringWidths[0], activewidth = self.z_ringWidths[0]*2)
+
+		self.reDraw()
+
+	def detach(self):
+		# hand the view back (and the editor, if it's on this thought)
+		if self.isEditing():
+			self.parentSheet.editor.commit()
+
+		view = self.view
+		view.owner = None
+		self.view = None
+
+		self.pulseCircleIndex = self.mainCircleIndex = self.mainRingIndex = None
+		self.labelIndex = self.smallCircleIndex = None
+		self.shadowIndex = None
+
+		return view
+
+	def hide(self):
+		self.visible = False
+
+		# a hidden thought has nothing to animate
+		self.parentSheet.animator.cancel(self)
+		self.lift = 0
+		self.pulsePause = False
+
+		# labels of hidden thoughts aren't kept up to date
+		self.parentSheet.timeKeeper.unwatch(self)
+
+		if self.view is not None:
+			self.parentSheet.releaseView(self.detach())
+
+	def show(self):
+		self.visible = True
+		if self.view is None:
+			self.attach(self.parentSheet.acquireView())
+
+	@property
+	def pixLoc(self):
+		# where the thought is on screen right now
+		return self.parentSheet.camera.toScreen(self.pos)
+
 	def setZooms(self):
 		self.curZoom = self.parentSheet.curZoom
 
@@ -102,56 +185,28 @@ class Thought:
 		self.z_smallRad = self.smallRad*(cz*0.5+0.5)	
 	
 	def initDrawing(self):
-		
+		# nothing is drawn until the sheet shows the thought (see show()),
+		#   only the state the drawing is based on gets set up here
 		self.setZooms()
-		self.pulsePause = True
-
-		self.reDraw(init=True)
-		self.setBinds()
-		
-		
 
-		self.tk_text.focus()
+		self.colourFromText()
 
-		self.handleHashTags()
-
-		self.updateFont()
-
-		#self.grow(max_r=self.z_r, stage=0)
-
-		self.pulsePause = False
+		#self.grow(max_r=self.z_r)
 
 		self.handleTime()
 
-	def reDraw(self, init=False, r=-1, pixChange=False, fromZoom=False):
-		canvasW=self.root.winfo_width()
-		canvasH=self.root.winfo_height()
+	def reDraw(self, r=-1, fromZoom=False):
+		# hidden thoughts get redrawn when they are shown again
+		if self.view is None: return
 
 		# r : radius of main circle
-		if init:
+		if r == -1:
 			r = self.z_r
-		else:
-			if r == -1:
-				r = self.z_r
-
-			# prevent bubbles from moving when screen resized
-			if pixChange:
-				self.loc = (1.0*self.pixLoc[0]/canvasW, 1.0*self.pixLoc[1]/canvasH)
 		r=int(r)
 		
 		# center of circle
-		x = 1.0*canvasW*self.loc[0]
-		y = 1.0*canvasH*self.loc[1]
-		self.pixLoc=(x,y)
-
-		'''
-		curTime = time.time()
-		draw = (curTime - self.prevDrawTime)>1./60
-		if draw or init:
-			self.prevDrawTime = curTime
-		else:
-			return
-		'''
+		x, y = self.pixLoc
+		y -= self.lift
 
 		''' 
 		draw filled circle for pulse animation
@@ -161,56 +216,27 @@ class Thought:
 		rFrac=0.5#1.1
 		x0p, y0p = (x+offset)-r*rFrac, (y+offset)-r*rFrac #x-r/2, y-r/2
 		x1p, y1p = (x+offset)+r*rFrac, (y+offset)+r*rFrac #x+r/2, y+r/2
-
-		if init:
-			fill = toHex(self.cs.lightGrey)
-			self.pulseCircleIndex = self.canvas.create_oval(x0p, y0p, x1p, y1p,
-				fill=fill, width=0, activewidth=0, tags="pulseCircle")
-
-			#self.canvas.tag_lower(self.pulseCircleIndex, "all")
-		else:
-			self.canvas.coords(self.pulseCircleIndex, x0p, y0p, x1p, y1p)
+		self.canvas.coords(self.pulseCircleIndex, x0p, y0p, x1p, y1p)
 
 		''' 
 		draw main filled circle
 		'''
 		x0p, y0p = x-r, y-r
 		x1p, y1p = x+r, y+r
-
-		if init:
-			fill, outline = toHex(self.colour), toHex(self.cs.highlight2)
-			self.mainCircleIndex = self.canvas.create_oval(x0p, y0p, x1p, y1p, fill=fill,
-					outline=fill, activeoutline=outline, width=2, activewidth=2, tags="mainCircle")
-			
-			#self.canvas.itemconfigure("mainCircle", cursor="hand1")
-		else:
-			self.canvas.coords(self.mainCircleIndex, x0p, y0p, x1p, y1p)
-
-		
-
+		self.canvas.coords(self.mainCircleIndex, x0p, y0p, x1p, y1p)
 
 		'''
-		now create and draw text box
+		now place the text
 		'''
-		if init:
-			self.tk_text = tk.Text(self.root, bd=0, highlightthickness=0, wrap="word",
-					font=(settings.MAIN_FONT, int(self.z_labelFontSize), "normal"),
-					bg=toHex(self.colour), fg=toHex(self.cs.lightText))
-
-			self.tk_text.insert(tk.END, self.text) # set initial text
-			self.tk_text.tag_configure("center", justify='center')
-			self.tk_text.tag_add("center", 1.0, "end")
-
-		tr = (r*0.7)
-		tx = x
-		ty = y
-		tx0p, ty0p = tx-tr, ty-tr
-		self.tk_text.place(x=tx0p, y=ty0p, width=2*tr, height=2*tr)
 		if fromZoom:
 			self.updateFont(fromZoom=True)
-
-
-
+			# the edit box doesn't scale with the canvas
+			if self.isEditing():
+				self.parentSheet.editor.place()
+		elif self.isEditing():
+			self.parentSheet.editor.place()
+		else:
+			self.view.placeText(self.textBox(r))
 
 		'''
 		draw ring around main filled circle
@@ -218,29 +244,14 @@ class Thought:
 		ring1_r = r+int(self.z_ringSpacing[0])
 		x0p, y0p = x-ring1_r, y-ring1_r
 		x1p, y1p = x+ring1_r, y+ring1_r
-		if init:
-			outline = toHex(self.cs.ring1)
-			self.mainRingIndex = self.canvas.create_oval(x0p, y0p, x1p, y1p, fill='',
-					outline=outline, activeoutline=toHex(self.cs.highlight2),
-					width=self.z_ringWidths[0], activewidth = self.z_ringWidths[0]*2)
-		else:
-			self.canvas.coords(self.mainRingIndex, x0p, y0p, x1p, y1p)
-			if fromZoom:
-				self.canvas.itemconfig(self.mainRingIndex, width=self.z_ringWidths[0], activewidth = self.z_ringWidths[0]*2)
-
-
+		self.canvas.coords(self.mainRingIndex, x0p, y0p, x1p, y1p)
+		if fromZoom:
+			self.canvas.itemconfig(self.mainRingIndex, width=self.z_ringWidths[0], activewidth = self.z_ringWidths[0]*2)
 
 		''' draw text for times above ring '''
 		tx = x
 		ty = y-r-int(self.z_ringSpacing[0]) - 10*self.curZoom
-		if init:
-			self.labelIndex = self.canvas.create_text(tx, ty,
-				text="", font=(settings.MAIN_FONT, int(self.z_fontSize), "normal"),
-				fill=toHex(shadeN([self.cs.background, self.cs.lightText], [0,1], 0.54)))
-
 		self.canvas.coords(self.labelIndex, tx, ty)
-		#if fromZoom:
-		#	self.updateFont(fromZoom=True)	
 
 		'''
 		draw small circle on outer ring
@@ -252,47 +263,20 @@ class Thought:
 		s_r = int(self.z_smallRad)
 		x0p, y0p = s_x-s_r, s_y-s_r
 		x1p, y1p = s_x+s_r, s_y+s_r
-		if init:
-			outline, fill = toHex(self.cs.ring1), toHex(self.cs.smallCircle)
-			self.smallCircleIndex = self.canvas.create_oval(x0p, y0p, x1p, y1p, fill=fill,
-					outline=outline, width=0, activefill=toHex(self.cs.highlight2))
-		else:
-			self.canvas.coords(self.smallCircleIndex, x0p, y0p, x1p, y1p)
-
-
-		''' draw circles under main circle for shadow '''
-		
-		if init:
-			self.shadowCircleIndex=[]
-		
-			self.numShadow = 10
-	
-		ns = 1.0*self.numShadow
-		
-		#reDraw = (time.time() - self.prevDrawTime)>0.1
-		for i in range(0,self.numShadow):
-		
-			x_offset = 0
-			y_offset = self.z_height
-
-			rFrac=1.0 + (1.0 +0.01*self.z_height)*(0.02*i)*(self.std_r/self.r)
-			x0p, y0p = (x+x_offset)-r*rFrac, (y+y_offset)-r*rFrac
-			x1p, y1p = (x+x_offset)+r*rFrac, (y+y_offset)+r*rFrac
-			if init:
-				fill = shadeN([self.cs.shadow, self.cs.background], [0,1.0], 1.0*math.sqrt(i/ns))
-				shadowIndex = self.canvas.create_oval(x0p, y0p, x1p, y1p, fill=toHex(fill), width=0)
-				self.shadowCircleIndex.append(shadowIndex)
-				self.canvas.tag_lower(shadowIndex, "all")
-			else:
-				#if reDraw:
-				self.canvas.coords(self.shadowCircleIndex[i], x0p, y0p, x1p, y1p)
-					#self.prevDrawTime=time.time()
+		self.canvas.coords(self.smallCircleIndex, x0p, y0p, x1p, y1p)
 
-				
+		''' shadow under main circle '''
+		showShadow = self.parentSheet.showShadows()
+		self.view.showShadow(showShadow)
+		if showShadow:
+			# rings grow by the same amount as the old concentric ovals did
+			spread = (1.0 +0.01*self.z_height)*0.02*self.std_r*self.curZoom
+			key, image = shadows.getSprite(self.canvas, self.cs, r, self.z_height+self.lift, spread)
+			self.view.setShadow(key, image, x, y)
 
 	def lowerShadows(self):
-		for i in range(0,self.numShadow):
-			self.canvas.tag_lower(self.shadowCircleIndex[i], "all")
+		if self.view is not None:
+			self.canvas.tag_lower(self.shadowIndex, "all")
 
 	def resizeCircleForText(self):
 		return
@@ -368,59 +352,6 @@ class Thought:
 
 		self.parentSheet.updateNodeEdges(self)
 
-	def setBinds(self):
-		# bind to release instea of press so that we can look
-		# at the most recently typed text
-		self.tk_text.bind('<KeyRelease>', self.typing)
-
-		# drag main circle to move
-		self.canvas.tag_bind(self.mainCircleIndex, '<Button-1>', self.startDrag)
-		self.canvas.tag_bind(self.mainCircleIndex, '<ButtonRelease-1>', self.endDrag)
-		self.canvas.tag_bind(self.mainCircleIndex, '<B1-Motion>', self.onLeftDrag)
-
-
-		# double click to run command
-		self.canvas.tag_bind(self.mainCircleIndex, '<Control-Button-1>', self.tryCommand)
-		# dragging main circle
-		self.canvas.tag_bind(self.mainCircleIndex, '<Button-3>', self.startDrag)
-		self.canvas.tag_bind(self.mainCircleIndex, '<ButtonRelease-3>', self.endDrag)
-		self.canvas.tag_bind(self.mainCircleIndex, '<B3-Motion>', self.onRightDrag)
-		# pulse when mouse over
-
-	
-		self.canvas.tag_bind(self.mainCircleIndex, '<Enter>',
-				(lambda event, widget="mainCircle": self.widgetEnter(event, widget)))
-		self.canvas.tag_bind(self.mainCircleIndex, '<Leave>',
-				(lambda event, widget="mainCircle": self.widgetLeave(event, widget)))
-
-		
-
-		# drag outer (left click) ring to resize
-		self.canvas.tag_bind(self.mainRingIndex, '<Button-1>', self.startDrag)
-		self.canvas.tag_bind(self.mainRingIndex, '<ButtonRelease-1>', self.endDrag)
-		self.canvas.tag_bind(self.mainRingIndex, '<B1-Motion>', self.onRingLeftDrag)
-
-		self.canvas.tag_bind(self.mainRingIndex, '<Button-3>', self.startDrag)
-		self.canvas.tag_bind(self.mainRingIndex, '<ButtonRelease-3>', self.endDrag)
-		self.canvas.tag_bind(self.mainRingIndex, '<B3-Motion>', self.onRingRightDrag)
-
-		self.canvas.tag_bind(self.mainRingIndex, '<Enter>',
-				(lambda event, widget="mainRing": self.widgetEnter(event, widget)))
-		self.canvas.tag_bind(self.mainRingIndex, '<Leave>',
-				(lambda event, widget="mainRing": self.widgetLeave(event, widget)))
-
-		# click small circle to create link
-		self.canvas.tag_bind(self.smallCircleIndex, '<Button-1>',
-				(lambda event, importance=1: self.linkAdd(importance)))
-
-		self.canvas.tag_bind(self.smallCircleIndex, '<Button-3>',
-				(lambda event, importance=0: self.linkAdd(importance)))
-
-		self.canvas.tag_bind(self.smallCircleIndex, '<Enter>',
-				(lambda event, widget="smallCircle": self.widgetEnter(event, widget)))
-		self.canvas.tag_bind(self.smallCircleIndex, '<Leave>',
-				(lambda event, widget="smallCircle": self.widgetLeave(event, widget)))
-
 	def widgetEnter(self, event=[], widget=""):
 		if widget=="mainCircle":
 			self.canvas.config(cursor="hand1")
@@ -443,10 +374,6 @@ class Thought:
 		#self.holding = True
 		#self.parentSheet.holding = True
 
-		canvasW=1.0*self.root.winfo_width()
-		canvasH=1.0*self.root.winfo_height()
-		self.loc = (self.pixLoc[0]/canvasW, self.pixLoc[1]/canvasH)
-
 		self.dragInit = (event.x, event.y)
 		self.cursorPos = (event.x, event.y)
 		self.dragFontInit = self.fontSize
@@ -458,6 +385,9 @@ class Thought:
 		self.parentSheet.pausePanning = True
 
 	def endDrag(self, event):
+		# finish any motion still waiting for the next frame
+		self.parentSheet.input.flush()
+
 		self.pulsePause = False
 		self.parentSheet.pausePanning = False
 
@@ -469,6 +399,13 @@ class Thought:
 		self.height /= 1.5
 		self.z_height /= 1.5
 		self.reDraw()
+
+		# a click (no drag) edits the text
+		if (event.x, event.y) == self.dragInit and event.num == 1:
+			self.parentSheet.editor.attach(self)
+
+		# thoughts pulled along may have come into (or left) the view
+		self.parentSheet.updateVisible()
 		
 		
 		self.lowerShadows()
@@ -482,8 +419,10 @@ class Thought:
 		#print "drag:", event.x, event.y
 		#self.moveTo((1.0*event.x/self.root.winfo_width(), 1.0*event.y/self.root.winfo_height()))
 
-		moveDelta = (1.0*delta[0]/self.root.winfo_width(), 1.0*delta[1]/self.root.winfo_height())
+		scale = self.parentSheet.camera.scale
+		moveDelta = (delta[0]/scale, delta[1]/scale)
 		self.moveBy(moveDelta)
+		self.parentSheet.recordMove(self)
 
 		# also move node's connections
 		self.groupShifted=True
@@ -497,7 +436,8 @@ class Thought:
 		self.cursorPos = (event.x, event.y)
 		#print "drag:", event.x, event.y
 		#self.moveTo((1.0*event.x/self.root.winfo_width(), 1.0*event.y/self.root.winfo_height()))
-		self.moveBy((1.0*delta[0]/self.root.winfo_width(), 1.0*delta[1]/self.root.winfo_height()))
+		self.moveByPix(delta, updateEdges=False)
+		self.parentSheet.recordMove(self)
 
 		self.parentSheet.updateNodeEdges(self)
 		return
@@ -521,8 +461,10 @@ class Thought:
 
 		self.r = d-self.ringSpacing[0]
 		self.z_r = cz*self.r
+		self.parentSheet.thoughtMoved(self)
 
-		self.reDraw()
+		self.parentSheet.renderer.markThought(self)
+		self.parentSheet.recordResize(self)
 
 		self.parentSheet.updateNodeEdges(self)
 
@@ -545,28 +487,13 @@ class Thought:
 
 		self.resizeCircleForText()
 
+		self.parentSheet.recordResize(self)
+
 	def tryCommand(self, event):
 		#print "trying command!"
 		
-		text = self.getText().strip()
-
-		if len(text) < 1: return
-
-		text = text.splitlines()
-
-		#print text
-
-		cmdLines=[]
-		for l in text:
-			l = l.strip()
-			if l.rfind('##') == 0:
-				l = l[2:].strip()
-
-			if len(l)<=4: continue
-			if l[0:2]=='[[' and l[len(l)-2:]==']]':
-				cmdLines.append(l[2:len(l)-2].strip())
-			else:
-				continue
+		# lines of the form [[command]]
+		cmdLines = markup.parse(self.getText()).commands
 
 		for cmd in cmdLines:
 
@@ -614,134 +541,85 @@ class Thought:
 			self.parentSheet.addLink()
 
 
-	def moveByPix(self, x):
-
-		newX, newY = self.pixLoc[0] + x[0], self.pixLoc[1]+x[1]
+	def moveByPix(self, x, updateEdges=True):
+		# x in screen pixels
+		scale = self.parentSheet.camera.scale
+		self.moveBy((x[0]/scale, x[1]/scale))
 
-		pixelX=self.root.winfo_width()
-		pixelY=self.root.winfo_height()
-
-		self.loc = (1.0*newX/pixelX, 1.0*newY/pixelY)
-
-		self.reDraw()
-
-		self.parentSheet.updateNodeEdges(self)
+		if updateEdges:
+			self.parentSheet.updateNodeEdges(self)
 
 	def moveBy(self, x):
-		newX = self.loc[0]+x[0] #max(min(self.loc[0]+x, 1), 0)
-		newY = self.loc[1]+x[1] #max(min(self.loc[1]+y, 1), 0)
-		
-		self.loc = (newX, newY)
+		# x in world coordinates
+		self.pos = (self.pos[0]+x[0], self.pos[1]+x[1])
+		self.parentSheet.thoughtMoved(self)
 
-		self.reDraw()
+		self.parentSheet.renderer.markThought(self)
 
 	def moveTo(self, x):
-		# must provide normalized coords (0-1)
-		self.moveBy((x[0] - self.loc[0], x[1] - self.loc[1]))
+		# must provide world coords
+		self.moveBy((x[0] - self.pos[0], x[1] - self.pos[1]))
 
 	def remove(self, event=[]):
 		
 
-		for i in self.shadowCircleIndex:
-			self.canvas.delete(i)
-		self.canvas.delete(self.mainCircleIndex)
-		self.canvas.delete(self.mainRingIndex)
-		self.canvas.delete(self.smallCircleIndex)
-		self.canvas.delete(self.labelIndex)
-
 		self.hasTime = False
 
-		self.canvas.delete(self.pulseCircleIndex)
-
 		self.widgetEnter()
 
-		#self.canvas.delete("all")
-
-		self.tk_text.destroy()
-		#self.tk_text.grid(row = 1, column = 0)
-		#self.tk_text.grid_remove()
+		# the view goes back to the pool for the next thought to show up
+		self.hide()
 
 		#self.parentSheet.pausePanning=False
 		self.parentSheet.removeThought(self.index)
 
 
 	def getText(self):
-		text = self.tk_text.get("0.0",tk.END)
-		text = text.strip()
-		return text
+		# while being edited the text lives in the sheet's editor
+		if self.isEditing():
+			return self.parentSheet.editor.getText()
+		return self.text
 
 	def typing(self, event):
-		#self.tk_text.tag_configure("center", 1.0, "end")
-		self.tk_text.tag_add("center", 1.0, "end")
-
 		self.handleTime()
 
 		self.handleHashTags()
 
 		self.resizeCircleForText()
 
+		self.parentSheet.recordText(self)
+
 	def handleHashTags(self, event=[]):
 		# check for hashtags
-		text = self.getText()+'  '
-
-		if len(text) <3 : return
+		# returns whether the fonts were updated
+		if not self.colourFromText(): return False
 
-		LIC = self.parentSheet.cs.background # low importance colour
-		
-		max_shades = 5
+		self.recolour()
 
-		HIC=(0,0,0)
+		self.updateFont()
 
-		
-		shadeChar='1'
-		foundTag=True
-		if '#b' in text:
-			shadeChar = text[text.rfind('#b')+2]
-			HIC = self.cs.blue
-		elif '#r' in text:
-			shadeChar = text[text.rfind('#r')+2]
-			HIC = self.cs.red
-		elif '#g' in text:
-			shadeChar = text[text.rfind('#g')+2]
-			HIC = self.cs.green
-		elif '#y' in text:
-			shadeChar = text[text.rfind('#y')+2]
-			HIC = self.cs.yellow
-		elif '#o' in text:
-			shadeChar = text[text.rfind('#o')+2]
-			HIC = self.cs.orange
-		elif '#p' in text:
-			shadeChar = text[text.rfind('#p')+2]
-			HIC = self.cs.purple
-		elif '#w' in text:
-			shadeChar = text[text.rfind('#w')+2]
-			HIC = self.cs.white
-		elif '#k' in text:
-			shadeChar = text[text.rfind('#k')+2]
-			HIC = self.cs.black
-		elif '#h' in text:
-			shadeChar = text[text.rfind('#h')+2]
-			HIC = self.cs.highlight
-		else:
-			self.colour = self.parentSheet.cs.def_thought#background
-			self.recolour()
-			foundTag=False
+		return True
 
+	def colourFromText(self):
+		# colour of the main circle from the hashtags in the text, returns
+		#   False if the text is too short to have any
+		m = markup.parse(self.getText())
 
-		if foundTag and not shadeChar.isdigit():
-			shadeChar = '1'
+		if m.empty: return False
 
-		# shades for for 1, 2, 3, 4, 5
-		if foundTag and shadeChar.isdigit():
-			self.colour = shadeN([HIC, self.parentSheet.cs.background], [1, max_shades+1], int(shadeChar))
+		max_shades = 5
 
+		if m.colour is None:
+			self.colour = self.parentSheet.cs.def_thought#background
+		else:
+			HIC = getattr(self.cs, m.colour)
 
-		self.recolour()
+			# shades for for 1, 2, 3, 4, 5
+			self.colour = shadeN([HIC, self.parentSheet.cs.background], [1, max_shades+1], m.shade)
 
-		self.updateFont()
+		return True
 
 	def updateFont(self, fromZoom=False):
-
 		# dynamically optimize text colour
 		textColour=self.textColour
 		lum = utils.luminance(self.colour)
@@ -758,239 +636,151 @@ class Thought:
 		
 		#if textColour != self.textColour:
 		self.textColour=textColour
-	
-		insertbg=[v*0.5+w*0.5 for v,w in zip(self.textColour, self.cs.def_thought)]
 
-		if not fromZoom:
-			self.tk_text.configure(fg=toHex(textColour), insertbackground=toHex(insertbg))
+		if self.view is None: return
 
+		self.view.setLabelFont((settings.MAIN_FONT, utils.fontSize(self.z_labelFontSize), "normal"))
 
-		if not fromZoom:
-			tags = list(self.tk_text.tag_names(index=None))
-			tags.remove("sel")
-			tags.remove("center")
-			for t in tags:
-				self.tk_text.tag_delete(t)
+		if self.isEditing():
+			self.parentSheet.editor.style()
+		else:
+			self.layoutText()
 
+	def textRuns(self):
+		# fonts the text is drawn with: (base font, lines), each line being
+		#   (line, [(start, end, font), ...]) for its words
+		m = markup.parse(self.getText())
+		fonts = self.fonts(m.weight)
 
-		text = self.getText()
+		lines = []
+		for line, half, spans in m.lines:
+			lines.append((line, [(start, end, fonts[markup.style(kind, half)]) for start, end, kind in spans]))
 
-		# check for bolding
-		fontThickness="normal"
-		if '#B' in text:
-			fontThickness = "bold"
-		elif '#I' in text:
-			fontThickness = "italic"
-		
-		self.tk_text.configure(font=(settings.MAIN_FONT, int(self.z_fontSize//1), fontThickness))
-		self.canvas.itemconfig(self.labelIndex, font=(settings.MAIN_FONT, max(1,int(self.z_labelFontSize//1)), "normal"))
-		
-		if '#' not in text and '*' not in text:
-			return
+		return fonts['base'], lines
 
-		pos=1
+	def fonts(self, weight):
+		# font of each of the named styles in markup.py, at the current zoom
+		def font(size, thickness=weight):
+			return (settings.MAIN_FONT, utils.fontSize(size), thickness)
 
-		LINES = text.splitlines()
+		return {'base':font(self.z_fontSize), 'small':font(self.z_fontSize/2),
+				'bold':font(self.z_fontSize, "bold"), 'smallBold':font(self.z_fontSize/2, "bold")}
 
-		for l in range(len(LINES)):
-			
-			line = LINES[l]
+	def textBox(self, r=None):
+		# screen box the text is drawn in
+		if r is None:
+			r = self.z_r
+		x, y = self.pixLoc
+		tr = r*0.7
+		return (x-tr, y-tr, x+tr, y+tr)
 
-			#print "line: ", line
+	def layoutText(self):
+		if self.view is None: return
 
-			if line.strip() == "" or ('#' not in line and '*' not in line):
-				pos += 1
-				continue
+		if self.isEditing():
+			self.view.hideText()
+			return
 
-			fontSize = self.z_fontSize
-			if len(line)>=2:
-				#if line[0:2] == '##':
-				if '##' in line:
-					fontSize = fontSize/2
-			
+		base, lines = self.textRuns()
+		self.view.layoutText(base, lines, self.textBox(), toHex(self.textColour))
 
-			locLS = 0
-			locRS = len(line)-1
-
-			# also colour each word by its importance
-			words = split2(line)
-			for W in words:
-				
-				word = W[0]
-				wStart = W[1]
-				wEnd = W[2]
-
-				
-				
-				if W[0][0]=='#':
-					tagName='%s.%s'%(pos,wStart)+'WF'
-					self.tk_text.tag_add(tagName, '%s.%s'%(pos,wStart), '%s.%s'%(pos, wStart+len(word)))
-					
-					self.tk_text.tag_config(tagName, font=(settings.MAIN_FONT, int(self.z_fontSize//2), fontThickness))
-				elif W[0][0]=='*' and W[0][len(W[0])-1]=='*':
-					tagName='%s.%s'%(pos,wStart)+'BF'
-					self.tk_text.tag_add(tagName, '%s.%s'%(pos,wStart), '%s.%s'%(pos, wStart+len(word)))
-			
-					self.tk_text.tag_config(tagName, font=(settings.MAIN_FONT, int(fontSize//1), "bold"))
-				else:
-					tagName='%s.%s'%(pos,wStart)+'norm'
-					self.tk_text.tag_add(tagName, '%s.%s'%(pos,wStart), '%s.%s'%(pos, wStart+len(word)))
-			
-					self.tk_text.tag_config(tagName, font=(settings.MAIN_FONT, int(fontSize//1), fontThickness))
+	def isEditing(self):
+		return self.parentSheet.editor.thought is self
 
-			pos += 1
-	
 	def handleTime(self):
-		text = self.getText()
-
-		start = text.find('<<')
-		end = text.find('>>')
-
-		# make sure the order is << then >>
-		hasTime=True
-		if start == -1 or end == -1 or end-start <= 3:
-			hasTime=False
-
-		if hasTime:
-
-			timeStr = text[start+2:end].strip()
+		timeStr = markup.parse(self.getText()).time
 
-			parsedTime = utils.parseTime(timeStr)
+		# epoch seconds, tags that aren't a time are ignored
+		tagTime = None
+		if timeStr is not None:
+			tagTime = utils.parseSeconds(timeStr)
 
-			self.parsedTime = parsedTime
-			# calculate time diff
-			diffStr = utils.timeDiff(parsedTime, short=True)
-			#print diffStr
-
-			if not self.hasTime:
-				self.hasTime = True
-				#print "starting thread"
-				self.watchTime()
-		
-
-			#self.canvas.itemconfig(self.labelIndex, text=diffStr)
+		if tagTime is not None:
+			self.tagTime = tagTime
+			self.hasTime = True
 		else:
 			self.hasTime = False
-			self.canvas.itemconfig(self.labelIndex, text="")
 
+		self.updateLabel()
 
-	def watchTime(self):
+	def updateLabel(self):
+		# the sheet's TimeKeeper calls this again when the label next changes
+		timeKeeper = self.parentSheet.timeKeeper
+		if self.view is None or not self.hasTime:
+			timeKeeper.unwatch(self)
 
-		if not self.hasTime:
-			return
-
-		diffStr = utils.timeDiff(self.parsedTime, short=True)
-		#print "watch: ", diffStr
-		self.canvas.itemconfig(self.labelIndex, text=diffStr)
+		if self.view is None: return
 
-		t = threading.Timer(5, self.watchTime)#, [[], stage+1, height])
-		t.daemon = True
-		t.start()
+		diffStr = ""
+		if self.hasTime:
+			diffStr = utils.formatDiff(self.tagTime, short=True)
+			timeKeeper.watch(self)
+		self.view.setLabel(diffStr)
 
 	def recolour(self, event=[]):
+		if self.view is None: return
 
 		self.canvas.itemconfig(self.mainCircleIndex, fill = toHex(self.colour), outline=toHex(self.colour))
-		self.tk_text.configure(bg=toHex(self.colour))
+		if self.isEditing():
+			self.parentSheet.editor.style()
 
 
 
-	def grow(self, max_r=50, stage=0):
+	def grow(self, max_r=50):
 		if self.parentSheet.fastGraphics: return
 
-		total_stages=10#max_r/3
-
-		if stage<=total_stages:
-			self.reDraw(r=1.0*max_r*stage / total_stages)
+		def step(f):
+			self.reDraw(r=1.0*max_r*f)
 
+		self.parentSheet.animator.animate(0.1, step, target=self)
 
-		self.root.update()
-
-		if stage < total_stages:
-			#t = threading.Timer(0.01, self.grow, [max_r, stage+1])
-			#t.daemon = True
-			#t.start()
-			time.sleep(0.005)
-			self.grow(max_r, stage+1)
-
-	def pulse(self, event=[], stage=0, height=6):
-
-		#print "pulse"
+	def pulse(self, event=[], height=6):
+		# jump up and land again, the shadow stays where it is
 
-		if self.pulsePause and stage==0: return
+		if self.pulsePause: return
 
 		#if self.parentSheet.holding and not self.holding: return
-		
-
-		if stage==0:
-			
 
-				
-			if time.time()-self.prevPulseTime <= 1:
-				return
-
-			self.pulsePause=True
-
-
-
-
-		total_stages=9
-		# fraction of way through pulse
-		f1 = 1.0*stage/total_stages
-	
-
-		if stage <= total_stages:
+		if time.time()-self.prevPulseTime <= 1:
+			return
 
-			pixMove=2*1.0*height/total_stages
-	
-			# make the jumping smoother
-			dt = -1.0*math.atan(2*(2*f1-1.0))
-			self.z_height += dt*pixMove
-			self.moveByPix((0,-1.0*pixMove*dt))
+		self.pulsePause=True
 
-			t = threading.Timer(0.03, self.pulse, [[], stage+1, height])
-			t.daemon = True
-			t.start()
+		def step(f):
+			# only how it's drawn moves, not pos
+			self.lift = height*self.curZoom*f
+			self.parentSheet.renderer.markThought(self)
 
-		else:
+		def done():
+			self.lift = 0
 			self.reDraw()
 			self.pulsePause=False
 
 			self.prevPulseTime = time.time()
 
+		self.parentSheet.animator.animate(0.3, step, ease=Animator.bounce, target=self, done=done)
 
-	def pulse2(self, event=[], stage=0):
-		if self.pulsePause and stage==0: return
 
-		if stage==0:
-			
-			if time.time()-self.prevPulseTime <= 1:
-				return
+	def pulse2(self, event=[]):
+		if self.pulsePause: return
+
+		if time.time()-self.prevPulseTime <= 1:
+			return
 
 		if self.colour == self.cs.def_thought: return
+		if self.view is None: return
 
 		#if self.parentSheet.fastGraphics: return
-		canvasW=self.root.winfo_width()
-		canvasH=self.root.winfo_height()
-
-		if stage==0:
-			self.canvas.tag_lower(self.pulseCircleIndex, "all")
-			#for i in range(self.numShadow):
-			#	self.canvas.tag_raise(self.pulseCircleIndex, self.shadowCircleIndex[i])
 
-		total_stages=10
-
-		f = 1.0*stage/total_stages
-
-		r = self.z_r
-		
-		# center of circle
-		x = 1.0*canvasW*self.loc[0]
-		y = 1.0*canvasH*self.loc[1]
+		self.canvas.tag_lower(self.pulseCircleIndex, "all")
 
-		#print "here"
+		self.pulsePause = True
 
-		if stage <= total_stages:
-			self.pulsePause = True
+		def step(f):
+			r = self.z_r
+			
+			# center of circle
+			x, y = self.pixLoc
 
 			pRad = 40*self.curZoom
 
@@ -999,75 +789,25 @@ class Thought:
 			x0p, y0p = x-curRad, y-curRad
 			x1p, y1p = x+curRad, y+curRad
 
-			fill = util.shadeN([self.colour, self.cs.def_thought], [0,1], f)
+			fill = shadeN([self.colour, self.cs.def_thought], [0,1], f)
 
 			self.canvas.coords(self.pulseCircleIndex, x0p, y0p, x1p, y1p)
 			self.canvas.itemconfig(self.pulseCircleIndex, fill = toHex(fill))
 
-
-
-			t = threading.Timer(0.04, self.pulse, [[], stage+1])
-			t.daemon = True
-			t.start()
-		else:
-			offset = 0 #10*self.curZoom
-			rFrac=0.5 #1.1
-			x0p, y0p = (x+offset)-r*rFrac, (y+offset)-r*rFrac #x-r/2, y-r/2
-			x1p, y1p = (x+offset)+r*rFrac, (y+offset)+r*rFrac #x+r/2, y+r/2
-			self.canvas.coords(self.pulseCircleIndex, x0p, y0p, x1p, y1p)
-			#self.canvas.itemconfig(self.pulseCircleIndex, fill = toHex(self.cs.lightGrey))
+		def done():
+			# back to its place in the middle (see reDraw)
+			self.reDraw()
 
 			self.pulsePause=False
 
 			self.prevPulseTime = time.time()
+
+		self.parentSheet.animator.animate(0.4, step, target=self, done=done)
 		
 		
-	def zoom(self, direction, location):
-		cz = self.parentSheet.curZoom
-		
+	def zoom(self):
+		# the sheet's camera has already zoomed (and the canvas been scaled),
+		#   only the sizes need updating before redrawing at the new zoom
 		self.setZooms()
 
-		pX, pY = self.root.winfo_width(), self.root.winfo_height()
-
-
-		f=1.0
-		if direction == "in":
-			f = self.parentSheet.zoomFac
-		else:
-			f = 1.0/self.parentSheet.zoomFac
-
-		#delta = getDir((pX/2, pY/2), self.pixLoc)
-		delta = utils.getDir(location, self.pixLoc)
-
-		delta2 = (delta[0]*f, delta[1]*f)
-
-		diff = (delta2[0]-delta[0], delta2[1]-delta[1])
-
-		self.pixLoc = (self.pixLoc[0]+diff[0], self.pixLoc[1]+diff[1])
-
-		self.reDraw(pixChange=True, fromZoom=True)
-
-
-def split2(string):
-
-	# return list of words with start and end indices of each
-	words = []
-
-	inWord=False
-	start = 0
-	end = 0
-	for i in range(len(string)):
-
-		if not inWord and string[i] != ' ':
-			inWord = True
-			start = i
-			end = 0
-		elif inWord and not string[i] != ' ':
-			inWord = False
-			end = i
-			words.append([string[start:end], start, end])
-		elif inWord and i == len(string)-1:
-			end = i+1
-			words.append([string[start:end], start, end])
-
-	return words
\ No newline at end of file
+		self.parentSheet.renderer.markThought(self, fromZoom=True)
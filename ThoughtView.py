@@ -0,0 +1,292 @@
+from collections import OrderedDict
+
+import settings
+from utils import toHex, shadeN
+
+
+class ThoughtView:
+
+	# the canvas items that draw a thought on screen.
+	#
+	# thoughts only hold a view while they are (near) the visible part of
+	#   the sheet. views are recycled through the sheet's pool (see
+	#   Sheet.acquireView) instead of being destroyed, so the number of Tk
+	#   items/widgets follows what's on screen rather than the sheet size.
+	#   events are passed on to whichever thought owns the view at the time.
+	#
+	# the text is drawn as canvas text items, one per run of words sharing a
+	#   font, so it moves along with canvas.move. editing happens in the
+	#   sheet's single text box (see Editor.py).
+
+	def __init__(self, sheet):
+		self.root = sheet.root
+		self.canvas = sheet.canvas
+		self.fonts = sheet.fonts
+		cs = sheet.cs
+
+		self.owner = None
+
+		# everything starts hidden at the origin, the owner places it
+		box = (0, 0, 0, 0)
+
+		# filled circle for pulse animation
+		self.pulseCircle = self.canvas.create_oval(box, fill=toHex(cs.lightGrey),
+				width=0, activewidth=0, tags="pulseCircle", state='hidden')
+
+		# main filled circle
+		fill, outline = toHex(cs.def_thought), toHex(cs.highlight2)
+		self.mainCircle = self.canvas.create_oval(box, fill=fill, outline=fill,
+				activeoutline=outline, width=2, activewidth=2, tags="mainCircle", state='hidden')
+
+		# text runs, created as needed by layoutText. they share a tag so
+		#   they can be moved and bound together
+		self.textTag = "text%s" % self.mainCircle
+		self.runs = []
+		self.runFonts = [] # font of each run, acquired from the registry
+		self.runOffsets = [] # where each run sits relative to the text box
+		self.numRuns = 0
+		self.textLayout = None # (base font, lines, fill) last laid out
+		self.textBox = None
+
+		# ring around main filled circle
+		self.mainRing = self.canvas.create_oval(box, fill='',
+				outline=toHex(cs.ring1), activeoutline=toHex(cs.highlight2), state='hidden')
+
+		# text for times above ring
+		self.labelText = ""
+		self.labelFont = None
+		self.label = self.canvas.create_text(0, 0, text="", font=(settings.MAIN_FONT, 8, "normal"),
+				fill=toHex(shadeN([cs.background, cs.lightText], [0,1], 0.54)), state='hidden')
+
+		# small circle on outer ring
+		self.smallCircle = self.canvas.create_oval(box, fill=toHex(cs.smallCircle),
+				outline=toHex(cs.ring1), width=0, activefill=toHex(cs.highlight2), state='hidden')
+
+		# shadow under main circle, a pre-rendered image (see shadows.py)
+		self.shadow = self.canvas.create_image(0, 0, tags="shadow", state='hidden')
+		self.canvas.tag_lower(self.shadow, "all")
+		self.shadowKey = None
+		self.shadowImage = None # keeps the image alive while it's shown
+		self.shadowShown = True
+
+		self.setBinds()
+
+	def bind(self, item, sequence, fn):
+		# fn(thought, event) runs for the thought owning the view when the
+		#   event comes in
+		def handler(event):
+			if self.owner is not None:
+				return fn(self.owner, event)
+
+		self.canvas.tag_bind(item, sequence, handler)
+
+	def setBinds(self):
+		# motion goes through the sheet's InputCoalescer, one update per frame
+		# the text behaves like the main circle under it
+		for item in (self.mainCircle, self.textTag):
+			# drag main circle to move (a click without dragging edits)
+			self.bind(item, '<Button-1>', lambda t, e: t.startDrag(e))
+			self.bind(item, '<ButtonRelease-1>', lambda t, e: t.endDrag(e))
+			self.bind(item, '<B1-Motion>', lambda t, e: t.parentSheet.input.add(t.onLeftDrag, e))
+
+			# double click to run command
+			self.bind(item, '<Control-Button-1>', lambda t, e: t.tryCommand(e))
+			# dragging main circle
+			self.bind(item, '<Button-3>', lambda t, e: t.startDrag(e))
+			self.bind(item, '<ButtonRelease-3>', lambda t, e: t.endDrag(e))
+			self.bind(item, '<B3-Motion>', lambda t, e: t.parentSheet.input.add(t.onRightDrag, e))
+
+		# pulse when mouse over
+		self.bind(self.mainCircle, '<Enter>', lambda t, e: t.widgetEnter(e, "mainCircle"))
+		self.bind(self.mainCircle, '<Leave>', lambda t, e: t.widgetLeave(e, "mainCircle"))
+
+		# drag outer (left click) ring to resize
+		self.bind(self.mainRing, '<Button-1>', lambda t, e: t.startDrag(e))
+		self.bind(self.mainRing, '<ButtonRelease-1>', lambda t, e: t.endDrag(e))
+		self.bind(self.mainRing, '<B1-Motion>', lambda t, e: t.parentSheet.input.add(t.onRingLeftDrag, e))
+
+		self.bind(self.mainRing, '<Button-3>', lambda t, e: t.startDrag(e))
+		self.bind(self.mainRing, '<ButtonRelease-3>', lambda t, e: t.endDrag(e))
+		self.bind(self.mainRing, '<B3-Motion>', lambda t, e: t.parentSheet.input.add(t.onRingRightDrag, e))
+
+		self.bind(self.mainRing, '<Enter>', lambda t, e: t.widgetEnter(e, "mainRing"))
+		self.bind(self.mainRing, '<Leave>', lambda t, e: t.widgetLeave(e, "mainRing"))
+
+		# click small circle to create link
+		self.bind(self.smallCircle, '<Button-1>', lambda t, e: t.linkAdd(1))
+		self.bind(self.smallCircle, '<Button-3>', lambda t, e: t.linkAdd(0))
+
+		self.bind(self.smallCircle, '<Enter>', lambda t, e: t.widgetEnter(e, "smallCircle"))
+		self.bind(self.smallCircle, '<Leave>', lambda t, e: t.widgetLeave(e, "smallCircle"))
+
+	def items(self):
+		return [self.pulseCircle, self.mainCircle, self.mainRing, self.label, self.smallCircle, self.shadow]
+
+	def layoutText(self, base, lines, box, fill):
+		# lay the words out in rows (wrapping at the box width, centred like
+		#   the old text boxes), one canvas text item per run of words with
+		#   the same font. rows that don't fit the box are left out
+		self.textLayout = (base, lines, fill)
+		self.textBox = box
+
+		x0, y0, x1, y1 = box
+		width = x1-x0
+
+		rows = [] # [(width, height, [(text, font, width), ...])]
+		for line, words in lines:
+			row, rowW = [], 0
+			rowH = lineSpace(self.fonts, base)
+
+			for start, end, font in words:
+				w = measure(self.fonts, font, line[start:end])
+				space = measure(self.fonts, font, ' ') if row else 0
+
+				if row and rowW+space+w > width:
+					rows.append((rowW, rowH, row))
+					row, rowW, space = [], 0, 0
+					rowH = lineSpace(self.fonts, base)
+
+				piece = line[start:end]
+				if row:
+					piece = ' '+piece
+
+				if row and row[-1][1] == font:
+					# same font as the previous word, extend its run
+					text, f, runW = row[-1]
+					row[-1] = (text+piece, f, runW+space+w)
+				else:
+					row.append((piece, font, space+w))
+
+				rowW += space+w
+				rowH = max(rowH, lineSpace(self.fonts, font))
+
+			rows.append((rowW, rowH, row))
+
+		n = 0
+		y = y0
+		cx = (x0+x1)/2.0
+		for rowW, rowH, row in rows:
+			if y+rowH > y1 and n > 0: break
+
+			x = cx-rowW/2.0
+			for text, font, w in row:
+				self.setRun(n, x, y, text, font, fill)
+				n += 1
+				x += w
+			y += rowH
+
+		# runs left over from longer texts
+		for i in range(n, self.numRuns):
+			self.canvas.itemconfig(self.runs[i], text="", state='hidden')
+		self.numRuns = n
+
+	def setRun(self, i, x, y, text, font, fill):
+		offset = (x-self.textBox[0], y-self.textBox[1])
+		if i < len(self.runOffsets):
+			self.runOffsets[i] = offset
+		else:
+			self.runOffsets.append(offset)
+
+		if i < len(self.runs):
+			self.canvas.coords(self.runs[i], x, y)
+			if font != self.runFonts[i]:
+				self.fonts.release(self.runFonts[i])
+				self.runFonts[i] = font
+				self.canvas.itemconfig(self.runs[i], font=self.fonts.acquire(font))
+			self.canvas.itemconfig(self.runs[i], text=text, fill=fill, state='normal')
+		else:
+			self.runs.append(self.canvas.create_text(x, y, anchor='nw', text=text, font=self.fonts.acquire(font),
+					fill=fill, tags=(self.textTag, "thoughtText")))
+			self.runFonts.append(font)
+
+	def placeText(self, box):
+		# move the laid out text to box, only laying it out again if the
+		#   box changed size. the runs are placed where they belong rather
+		#   than moved by how far the box moved, since a pan (canvas.move)
+		#   or zoom (canvas.scale) may have moved them in the meantime
+		old = self.textBox
+		if old is None or self.textLayout is None: return
+
+		if abs((box[2]-box[0])-(old[2]-old[0])) > 0.5:
+			base, lines, fill = self.textLayout
+			self.layoutText(base, lines, box, fill)
+			return
+
+		for i in range(self.numRuns):
+			dx, dy = self.runOffsets[i]
+			self.canvas.coords(self.runs[i], box[0]+dx, box[1]+dy)
+		self.textBox = box
+
+	def setLabel(self, text):
+		if text != self.labelText:
+			self.canvas.itemconfig(self.label, text=text)
+			self.labelText = text
+
+	def setLabelFont(self, font):
+		if font != self.labelFont:
+			if self.labelFont is not None:
+				self.fonts.release(self.labelFont)
+			self.canvas.itemconfig(self.label, font=self.fonts.acquire(font))
+			self.labelFont = font
+
+	def setShadow(self, key, image, x, y):
+		if key != self.shadowKey:
+			self.canvas.itemconfig(self.shadow, image=image)
+			self.shadowKey, self.shadowImage = key, image
+		self.canvas.coords(self.shadow, x, y)
+
+	def showShadow(self, show):
+		if show != self.shadowShown:
+			self.canvas.itemconfig(self.shadow, state='normal' if show else 'hidden')
+			self.shadowShown = show
+
+	def hideText(self):
+		self.canvas.itemconfig(self.textTag, state='hidden')
+
+	def showText(self):
+		for i in range(self.numRuns):
+			self.canvas.itemconfig(self.runs[i], state='normal')
+
+	def show(self):
+		for i in self.items():
+			self.canvas.itemconfig(i, state='normal')
+		self.shadowShown = True
+		self.showText()
+
+	def hide(self):
+		for i in self.items():
+			self.canvas.itemconfig(i, state='hidden')
+		self.hideText()
+
+	def destroy(self):
+		for i in self.items():
+			self.canvas.delete(i)
+		self.canvas.delete(self.textTag)
+
+		for font in self.runFonts:
+			self.fonts.release(font)
+		if self.labelFont is not None:
+			self.fonts.release(self.labelFont)
+
+
+# text measurements, cached since the same words in the same fonts come up
+#   over and over while laying out. least recently used ones go first.
+#   fonts: the sheet's FontRegistry
+maxWidths = 4096
+
+widths = OrderedDict()
+
+def measure(fonts, font, text):
+	key = (font, text)
+	w = widths.get(key)
+	if w is not None:
+		widths.move_to_end(key)
+		return w
+
+	w = widths[key] = fonts.get(font).measure(text)
+	if len(widths) > maxWidths:
+		widths.popitem(last=False)
+	return w
+
+def lineSpace(fonts, font):
+	return fonts.get(font).metrics('linespace')
@@ -0,0 +1,71 @@
+import time
+import heapq
+import itertools
+
+import utils
+
+
+class TimeKeeper:
+
+	# keeps the countdown labels of time tagged thoughts (<<...>>) up to
+	#   date. instead of every thought polling its label on a timer, the
+	#   visible ones sit in a heap by when their short label will next read
+	#   differently, and a single root.after wakes up for the earliest one.
+	#
+	# hidden thoughts aren't kept at all, their label gets set when they are
+	#   shown again (see Thought.updateLabel).
+
+	def __init__(self, root):
+		self.root = root
+
+		self.heap = [] # (due time, seq, thought)
+		self.seq = itertools.count()
+		self.entries = {} # thought -> seq of its current heap entry
+
+		self.pending = None
+		self.pendingDue = None
+
+	def watch(self, thought):
+		# (re)schedule thought for when its label next changes
+		due = time.time()+utils.nextChange(thought.tagTime)
+
+		seq = next(self.seq)
+		self.entries[thought] = seq
+		heapq.heappush(self.heap, (due, seq, thought))
+
+		self.schedule()
+
+	def unwatch(self, thought):
+		# the heap entry is left behind and skipped when it comes up
+		self.entries.pop(thought, None)
+
+	def schedule(self):
+		# drop entries of thoughts that are no longer watched
+		while self.heap and self.entries.get(self.heap[0][2]) != self.heap[0][1]:
+			heapq.heappop(self.heap)
+
+		if not self.heap:
+			return
+
+		due = self.heap[0][0]
+		if self.pending is not None:
+			if due >= self.pendingDue: return
+			self.root.after_cancel(self.pending)
+
+		delay = max(1, int(1000*(due-time.time())))
+		self.pending = self.root.after(delay, self.tick)
+		self.pendingDue = due
+
+	def tick(self):
+		self.pending = None
+
+		now = time.time()
+		while self.heap and self.heap[0][0] <= now:
+			due, seq, thought = heapq.heappop(self.heap)
+			if self.entries.get(thought) != seq: continue
+
+			del self.entries[thought]
+			# sets the label and watches it again if it still has a time
+			thought.updateLabel()
+
+		self.schedule()
@@ -0,0 +1,95 @@
+import time
+from collections import OrderedDict
+
+import parsedatetime
+
+
+class TimeParser:
+
+	# natural language times for the <<...>> tags, via parsedatetime.
+	#
+	# the Calendar is built once, and results are cached by the normalized
+	#   input since the tag of the thought being typed in is parsed again on
+	#   every key. how a result is kept depends on what it was relative to:
+	#   "in 2 hours" is kept as an offset from the time it's parsed at, and
+	#   anything else only for the day it was parsed on. that includes
+	#   things that look fixed from two nearby parses ("friday 10am" doesn't
+	#   move within a day), since they can still move with the date.
+
+	maxEntries = 512
+
+	# to spot offsets inputs are parsed at two times this far apart
+	probeShift = 90061 # 1d 1h 1m 1s
+
+	def __init__(self):
+		self.cal = parsedatetime.Calendar()
+
+		# normalized input -> (kind, value, worked, date parsed on)
+		self.cache = OrderedDict()
+
+	def normalize(self, inStr):
+		inStr = ' '.join(inStr.lower().split())
+
+		if "from now" not in inStr and "in " in inStr:
+			inStr = inStr.replace("in ", " ")
+			inStr = inStr+" from now"
+
+		inStr = inStr.replace("by ", " ")
+		inStr = inStr.replace("a little while", "10 minutes")
+		inStr = inStr.replace("a while", "30 minutes")
+		inStr = inStr.replace("a couple", "2")
+		inStr = inStr.replace("a few", "3")
+		inStr = inStr.replace("some time", "2 hours")
+		inStr = inStr.replace("several", "6")
+		inStr = inStr.replace("midnight", "11:59 pm")
+		inStr = inStr.replace("soon", "30 minutes from now")
+
+		inStr = inStr.replace("half hour", "30 minutes")
+		inStr = inStr.replace("half an hour", "30 minutes")
+		inStr = inStr.replace("half a day", "12 hours")
+
+		return inStr
+
+	def parseSeconds(self, inStr, now=None):
+		# -> (epoch seconds, worked)
+		if now is None:
+			now = time.time()
+		now = int(now)
+		today = time.localtime(now)[:3]
+
+		key = self.normalize(inStr)
+
+		entry = self.cache.get(key)
+		if entry is not None:
+			kind, value, worked, day = entry
+			if kind == 'offset':
+				self.cache.move_to_end(key)
+				return now+value, worked
+			if day == today:
+				self.cache.move_to_end(key)
+				return value, worked
+
+		T, worked = self.cal.parse(key, time.localtime(now))
+		secs = int(time.mktime(T))
+		worked = worked != 0
+
+		# parse again later on to see what the result moves with
+		T2, w2 = self.cal.parse(key, time.localtime(now+self.probeShift))
+		moved = int(time.mktime(T2))-secs
+
+		if moved == self.probeShift:
+			entry = ('offset', secs-now, worked, today)
+		else:
+			entry = ('day', secs, worked, today)
+
+		self.cache[key] = entry
+		if len(self.cache) > self.maxEntries:
+			self.cache.popitem(last=False)
+
+		return secs, worked
+
+	def parse(self, inStr):
+		# same as parseSeconds, as a time vector (see utils.getTimeVec)
+		secs, worked = self.parseSeconds(inStr)
+		T = time.localtime(secs)
+		return {"year":T[0], "month":T[1], "day":T[2], "hour":T[3], "minute":T[4], "second":T[5], "worked":worked}
@@ -0,0 +1,255 @@
+import os
+import sys
+import time
+import json
+import random
+import shutil
+import tempfile
+
+import sheetio
+from Camera import Camera
+
+'''
+rough performance checks for the parts of MindMap that have to scale with
+the size of a sheet. run with:
+
+	python3 benchmark.py [name ...]
+
+with no names every benchmark is run.
+'''
+
+
+class FakeThought:
+	# stands in for Thought: just the attributes the serializer reads
+	def __init__(self, i):
+		self.index = i+1
+		self.pos = (random.uniform(-5000, 5000), random.uniform(-5000, 5000))
+		self.r = random.uniform(30, 90)
+		self.fontSize = random.randint(8, 20)
+		self.text = "thought %s #b%s" % (i, i % 5 + 1)
+
+	def getText(self):
+		return self.text
+
+
+class FakeLink:
+	def __init__(self, tA, tB):
+		self.tA = tA
+		self.tB = tB
+		self.importance = random.randint(0, 1)
+
+
+def fakeSheet(n):
+	# n thoughts and n links (a chain plus random extra edges)
+	thoughts = [FakeThought(i) for i in range(n)]
+	links = [FakeLink(thoughts[i], thoughts[i+1]) for i in range(n-1)]
+	links.append(FakeLink(thoughts[0], thoughts[random.randrange(n)]))
+	return thoughts, links
+
+
+def timeIt(fn, repeat=3):
+	best = None
+	for i in range(repeat):
+		t0 = time.perf_counter()
+		fn()
+		dt = time.perf_counter()-t0
+		if best is None or dt < best:
+			best = dt
+	return best
+
+
+def benchSave(sizes=(1000, 10000, 100000)):
+	print("save (serialize + json.dumps), thoughts = links = n")
+
+	perItem = []
+	for n in sizes:
+		thoughts, links = fakeSheet(n)
+
+		def save():
+			data = sheetio.serialize("1000x500+0+0", Camera(), thoughts, links)
+			json.dumps(data, indent=4)
+
+		dt = timeIt(save)
+		perItem.append(dt/n)
+		print("  n=%7d  %8.3f s  %6.2f us/item" % (n, dt, 1e6*dt/n))
+
+	# linear => time per item stays (roughly) flat as the sheet grows
+	growth = perItem[-1]/perItem[0]
+	print("  per-item growth %sx -> %sx: %.2f" % (sizes[0], sizes[-1], growth))
+	return growth < 3.0
+
+
+def benchLoad(sizes=(1000, 3000)):
+	# needs a display: builds a real Tk window and loads sheets into it
+	import tkinter as tk
+	from Sheet import Sheet
+
+	print("load (SheetLoader, bulk mode), links = thoughts")
+
+	try:
+		root = tk.Tk()
+	except tk.TclError as e:
+		print("  skipped, no display:", e)
+		return True
+
+	tmpDir = tempfile.mkdtemp()
+	try:
+		for n in sizes:
+			thoughts, links = fakeSheet(n)
+			for t in thoughts:
+				t.pos = (random.uniform(0, 1000), random.uniform(0, 500))
+			filename = os.path.join(tmpDir, 'bench%s.json' % n)
+			sheetio.jsonWrite(sheetio.serialize("1000x500+0+0", Camera(), thoughts, links), filename)
+
+			canvas = tk.Canvas(root)
+			t0 = time.perf_counter()
+			sheet = Sheet(root=root, canvas=canvas, filename=filename)
+			while sheet.loader is not None:
+				root.update()
+			dt = time.perf_counter()-t0
+
+			print("  n=%6d  %7.2f s  %6.3f s per 1k thoughts" % (n, dt, 1000.0*dt/n))
+
+			canvas.destroy()
+			for w in root.place_slaves():
+				w.destroy()
+	finally:
+		root.destroy()
+		shutil.rmtree(tmpDir)
+
+	return True
+
+
+class FakeEvent:
+	def __init__(self, x, y):
+		self.x = x
+		self.y = y
+
+
+def benchDrag(n=3000, steps=200, perFrame=4):
+	# needs a display: pans a loaded sheet with motion events coming in
+	#   faster than frames (perFrame of them between two updates), and
+	#   reports the input-to-draw latency the InputCoalescer measured
+	import tkinter as tk
+	from Sheet import Sheet
+
+	print("drag (panning), %s thoughts, %s motion events per update" % (n, perFrame))
+
+	try:
+		root = tk.Tk()
+	except tk.TclError as e:
+		print("  skipped, no display:", e)
+		return True
+
+	tmpDir = tempfile.mkdtemp()
+	try:
+		thoughts, links = fakeSheet(n)
+		for t in thoughts:
+			t.pos = (random.uniform(0, 1000), random.uniform(0, 500))
+		filename = os.path.join(tmpDir, 'bench.json')
+		sheetio.jsonWrite(sheetio.serialize("1000x500+0+0", Camera(), thoughts, links), filename)
+
+		sheet = Sheet(root=root, canvas=tk.Canvas(root), filename=filename)
+		while sheet.loader is not None:
+			root.update()
+
+		x, y = 500, 250
+		sheet.startDrag(FakeEvent(x, y))
+		for i in range(steps):
+			for j in range(perFrame):
+				x += 1
+				sheet.input.add(sheet.onDrag, FakeEvent(x, y))
+			root.update()
+		sheet.endThoughtDrag(FakeEvent(x, y))
+		# let the last frame get drawn
+		for i in range(20):
+			root.update()
+			time.sleep(0.01)
+
+		mean, worst = sheet.input.latency()
+		print("  latency  mean %6.1f ms  worst %6.1f ms" % (mean, worst))
+	finally:
+		root.destroy()
+		shutil.rmtree(tmpDir)
+
+	return mean < 100.0
+
+
+def benchParse(n=2000):
+	# time tags as they come in while typing: the same few strings over and
+	#   over (one per key release), with some new ones now and then
+	from TimeParser import TimeParser
+
+	print("parse (time tags), %s parses" % n)
+
+	words = ["in 2 hours", "tomorrow", "5pm", "friday 10am", "in a while",
+		"14:00 18/10/2026", "next week", "soon", "in 3 days", "midnight"]
+	inputs = [random.choice(words) for i in range(n)]
+
+	def cold():
+		# a new parser each time, so every parse is a miss
+		for s in inputs[:n//10]:
+			TimeParser().parseSeconds(s)
+
+	parser = TimeParser()
+	def warm():
+		for s in inputs:
+			parser.parseSeconds(s)
+
+	dtCold = timeIt(cold)/(n//10)
+	dtWarm = timeIt(warm)/n
+	print("  uncached  %8.1f us/parse" % (1e6*dtCold))
+	print("  cached    %8.1f us/parse  (%.0fx)" % (1e6*dtWarm, dtCold/dtWarm))
+	return dtWarm < dtCold
+
+
+def benchAgenda(sheets=2000, perSheet=20):
+	# agenda start up with lots of sheets, first scan vs from the cache
+	from Agenda import Agenda
+
+	print("agenda, %s sheets of %s thoughts (1 in 5 with a time tag)" % (sheets, perSheet))
+
+	words = ["in 2 hours", "tomorrow", "5pm", "friday 10am", "14:00 18/10/2026"]
+
+	tmpDir = tempfile.mkdtemp()
+	try:
+		for i in range(sheets):
+			thoughts, links = fakeSheet(perSheet)
+			for t in thoughts[::5]:
+				t.text += " <<%s>>" % random.choice(words)
+			sheetio.jsonWrite(sheetio.serialize("1000x500+0+0", Camera(), thoughts, links),
+					os.path.join(tmpDir, 'bench%s.json' % i))
+
+		t0 = time.perf_counter()
+		Agenda(tmpDir).update()
+		dtCold = time.perf_counter()-t0
+
+		def warm():
+			Agenda(tmpDir).update()
+		dtWarm = timeIt(warm)
+
+		print("  first scan  %8.1f ms" % (1000*dtCold))
+		print("  cached      %8.1f ms" % (1000*dtWarm))
+	finally:
+		shutil.rmtree(tmpDir)
+
+	return dtWarm < dtCold
+
+
+BENCHMARKS = {
+	'save': benchSave,
+	'load': benchLoad,
+	'drag': benchDrag,
+	'parse': benchParse,
+	'agenda': benchAgenda,
+}
+
+
+if __name__ == "__main__":
+	names = sys.argv[1:] or list(BENCHMARKS)
+
+	ok = True
+	for name in names:
+		ok = BENCHMARKS[name]() and ok
+
+	sys.exit(0 if ok else 1)
@@ -0,0 +1,154 @@
+
+# the markup in a thought's text, read in one go.
+#
+#   #b #r #g #y #o #p #w #k #h   colour of the thought, optionally followed
+#                                by a shade 1-5 (#b2)
+#   #B #I                        bold/italic text
+#   ## in a line                 line at half size
+#   #word                        small word
+#   *word*                       bold word
+#   <<...>>                      time tag (see TimeKeeper.py)
+#   [[...]] as a line            command, run with control-click
+#
+# the text of a thought is looked at for its colour, fonts, time and
+#   commands whenever it changes (on every key while typing), so results
+#   are cached by text.
+
+from collections import OrderedDict
+
+import utils
+
+
+# colour tags, the first one found in this order wins
+colourTags = [('b', 'blue'), ('r', 'red'), ('g', 'green'), ('y', 'yellow'), ('o', 'orange'),
+	('p', 'purple'), ('w', 'white'), ('k', 'black'), ('h', 'highlight')]
+
+# what a word is drawn as
+BASE = 'base'   # the thought's font (lines without any markup)
+TAG = 'tag'     # #word, half size
+BOLD = 'bold'   # *word*
+PLAIN = 'plain' # the line's size, the thought's weight
+
+# named styles the kinds come out as, depending on whether the line is
+#   half size. 'base' is the thought's font itself
+styles = ['base', 'small', 'bold', 'smallBold']
+
+def style(kind, half):
+	if kind == TAG:
+		return 'small'
+	if kind == BOLD:
+		return 'smallBold' if half else 'bold'
+	if kind == PLAIN and half:
+		return 'small'
+	return 'base'
+
+maxEntries = 1024
+cache = OrderedDict()
+
+
+class Markup:
+
+	def __init__(self, text):
+		self.empty = text == ''
+
+		# colour scheme attribute (e.g. 'blue') and shade, None if untagged
+		self.colour = None
+		self.shade = 1
+
+		# 'normal', 'bold' or 'italic'
+		self.weight = 'normal'
+
+		# [(line, half size, [(start, end, kind), ...]), ...]
+		self.lines = []
+
+		# contents of the time tag, None if there isn't one
+		self.time = utils.timeTag(text)
+
+		self.commands = []
+
+		self.read(text)
+
+	def read(self, text):
+		# where each #x was last seen
+		lastTag = {}
+		i = text.find('#')
+		while i != -1:
+			lastTag[text[i+1:i+2]] = i
+			i = text.find('#', i+1)
+
+		for tag, colour in colourTags:
+			if tag in lastTag:
+				self.colour = colour
+				shadeChar = (text+'  ')[lastTag[tag]+2]
+				if shadeChar.isdigit():
+					self.shade = int(shadeChar)
+				break
+
+		if 'B' in lastTag:
+			self.weight = 'bold'
+		elif 'I' in lastTag:
+			self.weight = 'italic'
+
+		styled = len(lastTag) > 0 or '*' in text
+
+		for line in text.splitlines():
+			lineStyled = styled and ('#' in line or '*' in line)
+
+			words = []
+			for word, wStart, wEnd in split2(line):
+				if not lineStyled:
+					kind = BASE
+				elif word[0]=='#':
+					kind = TAG
+				elif word[0]=='*' and word[len(word)-1]=='*':
+					kind = BOLD
+				else:
+					kind = PLAIN
+				words.append((wStart, wEnd, kind))
+
+			self.lines.append((line, '##' in line, words))
+
+			# a line that's only [[...]] (possibly made small with ##) is a command
+			l = line.strip()
+			if l.rfind('##') == 0:
+				l = l[2:].strip()
+			if len(l) > 4 and l[0:2]=='[[' and l[len(l)-2:]==']]':
+				self.commands.append(l[2:len(l)-2].strip())
+
+
+def parse(text):
+	m = cache.get(text)
+	if m is not None:
+		cache.move_to_end(text)
+		return m
+
+	m = cache[text] = Markup(text)
+	if len(cache) > maxEntries:
+		cache.popitem(last=False)
+
+	return m
+
+
+def split2(string):
+
+	# return list of words with start and end indices of each
+	words = []
+
+	inWord=False
+	start = 0
+	end = 0
+	for i in range(len(string)):
+
+		if not inWord and string[i] != ' ':
+			inWord = True
+			start = i
+			end = 0
+		elif inWord and not string[i] != ' ':
+			inWord = False
+			end = i
+			words.append([string[start:end], start, end])
+		elif inWord and i == len(string)-1:
+			end = i+1
+			words.append([string[start:end], start, end])
+
+	return words
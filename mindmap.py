@@ -30,8 +30,8 @@ def graphics_init():
 
 
 def exit_app():
-    # check if saving
-    # if not:
+    # let any save still being written finish first
+    sheet.close()
     tk_root.destroy()
 
 
@@ -0,0 +1,76 @@
+
+# pre-rendered thought shadows.
+#
+# a shadow used to be 10 concentric ovals per thought, each moved on every
+#   redraw. now it is drawn once into an image per (radius, height, spread,
+#   colour scheme) and placed as a single canvas image item. sizes are
+#   bucketed so that thoughts of about the same size share an image.
+
+import math
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw, ImageTk
+
+from utils import shadeN
+
+
+numShadow = 10
+
+# rendered images kept around, least recently used ones go first
+maxSprites = 256
+
+sprites = OrderedDict()
+schemeColours = {}
+
+
+def bucket(v):
+	# 1px steps for small sizes, ~3% steps for big ones
+	if v < 32:
+		return max(1, int(round(v)))
+	step = 2**int(math.log(v, 2))/32.0
+	return round(v/step)*step
+
+
+def colours(cs):
+	# fill of each ring, innermost first
+	key = (tuple(cs.shadow), tuple(cs.background))
+	c = schemeColours.get(key)
+	if c is None:
+		ns = 1.0*numShadow
+		c = schemeColours[key] = tuple(tuple(int(round(255*v)) for v in shadeN([cs.shadow, cs.background], [0,1.0], math.sqrt(i/ns)))
+				for i in range(numShadow))
+	return c
+
+
+def getSprite(master, cs, r, height, spread):
+	# image of the shadow of a circle with (screen) radius r, the rings
+	#   growing by spread pixels each. returns (key, image), the image is
+	#   centred on the circle's centre moved down by height
+	fills = colours(cs)
+	key = (bucket(r), int(round(height)), round(spread*4)/4.0, fills)
+
+	photo = sprites.get(key)
+	if photo is not None:
+		sprites.move_to_end(key)
+		return key, photo
+
+	r, height, spread = key[0], key[1], key[2]
+
+	R = r+spread*(numShadow-1)
+	size = int(math.ceil(2*(R+height)))+2
+	c = size/2.0
+
+	img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+	draw = ImageDraw.Draw(img)
+	# biggest (palest) first so the darker ones end up on top
+	for i in reversed(range(numShadow)):
+		ri = r+spread*i
+		draw.ellipse([c-ri, c+height-ri, c+ri, c+height+ri], fill=fills[i])
+
+	photo = ImageTk.PhotoImage(img, master=master)
+
+	sprites[key] = photo
+	if len(sprites) > maxSprites:
+		sprites.popitem(last=False)
+
+	return key, photo
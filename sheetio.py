@@ -0,0 +1,390 @@
+
+# reading/writing of sheet data (the dict stored in Sheets/*.json, or its
+#   binary equivalent in *.mms files)
+
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+
+import utils
+
+
+
+def serialize(geometry, camera, thoughts, links, journalSeq=0):
+	# build the sheet dict in a single pass over thoughts and links
+	#
+	# links store the (1-based) position of their thoughts in the thought
+	#   list, so build a thought -> position map up front instead of
+	#   calling list.index() for every link end
+	data = {}
+	data['root_geometry'] = geometry
+
+	data['thoughts'] = []
+
+	# thoughts are stored in world coordinates, the camera maps them to
+	#   the screen (see Camera.py)
+	data['camera'] = camera.toData()
+
+	# last journal record included in this snapshot (see Journal.py)
+	data['journalSeq'] = journalSeq
+
+	position = {}
+	for t in thoughts:
+		#need to add 1 since index assignments for thoughts starts at 1
+		#   instead of 0
+		position[id(t)] = len(data['thoughts'])+1
+
+		tData={}
+		tData['id'] = t.index
+		tData['pos'] = list(t.pos)
+		tData['radius'] = t.r
+		tData['text'] = t.getText()
+		tData['fontSize'] = t.fontSize
+
+		data['thoughts'].append(tData)
+
+	data['links'] = []
+	for l in links:
+		lData={}
+		lData['tA'] = position[id(l.tA)]
+		lData['tB'] = position[id(l.tB)]
+		lData['importance'] = l.importance
+
+		data['links'].append(lData)
+
+	return data
+
+
+def iterJson(filename, chunkSize=1<<16):
+	# stream a sheet json file without reading it all in first. yields
+	#   ('value', key, value) for top-level entries and ('item', key, element)
+	#   for every element of a top-level array (thoughts, links)
+	decoder = json.JSONDecoder()
+
+	with open(filename) as f:
+		buf = ''
+		pos = 0
+		eof = False
+
+		def more(size=chunkSize):
+			# drop what's been consumed and add the next chunk
+			nonlocal buf, pos, eof
+			chunk = f.read(size)
+			if chunk == '':
+				eof = True
+			buf = buf[pos:]+chunk
+			pos = 0
+
+		def peek():
+			# next non-whitespace char (without consuming it)
+			nonlocal pos
+			while True:
+				while pos < len(buf) and buf[pos] in ' \t\r\n':
+					pos += 1
+				if pos < len(buf):
+					return buf[pos]
+				if eof:
+					raise ValueError("unexpected end of "+filename)
+				more()
+
+		def value():
+			# decode one json value, reading more if it might be cut off.
+			#   strings, objects and arrays end themselves, but a number (or
+			#   true/false/null) is only complete once something follows it
+			nonlocal pos
+			delimited = peek() in '"{['
+			# a value bigger than a chunk reads twice as much each retry, so
+			#   decoding it again from the start stays linear overall
+			size = chunkSize
+			while True:
+				try:
+					v, end = decoder.raw_decode(buf, pos)
+					if eof or delimited or (end < len(buf) and buf[end] in ',:]} \t\r\n'):
+						pos = end
+						return v
+				except ValueError:
+					if eof: raise
+				more(size)
+				size *= 2
+
+		if peek() != '{':
+			raise ValueError("not a sheet: "+filename)
+		pos += 1
+
+		while True:
+			c = peek()
+			if c == '}':
+				return
+			if c == ',':
+				pos += 1
+				continue
+
+			key = value()
+			if peek() != ':':
+				raise ValueError("bad sheet json: "+filename)
+			pos += 1
+
+			if peek() == '[':
+				pos += 1
+				while True:
+					c = peek()
+					if c == ']':
+						pos += 1
+						break
+					if c == ',':
+						pos += 1
+						continue
+					yield ('item', key, value())
+			else:
+				yield ('value', key, value())
+
+
+'''
+binary sheet container (*.mms)
+
+all numbers little-endian, every section starts 8-byte aligned:
+
+	header     magic (8s), version (I), thoughts (I), links (I), meta length (I)
+	meta       utf-8 json of the top-level keys (thoughts/links set to null)
+	x, y       float64 column each (pos, or pixLoc for older sheets)
+	radius     float64 column
+	fontSize   float64 column
+	id         int64 column
+	textEnd    uint64 column, end offset of each text in the string table
+	tA, tB     int64 column each (positions, like in the json links)
+	importance int64 column
+	flags      uint8 column, which of the numbers were ints in the json
+	strings    utf-8 text of all thoughts, back to back
+
+the file is read through mmap, so positions/radii can be looked at without
+decoding any of the texts.
+'''
+
+MAGIC = b'MMSHEET\0'
+VERSION = 1
+HEADER = struct.Struct('<8sIIII')
+
+BINARY_EXT = '.mms'
+JSON_EXT = '.json'
+
+# flag bits: number was an int in the json / thought had no id / position
+#   is a world 'pos' rather than an old style 'pixLoc'
+F_X_INT, F_Y_INT, F_R_INT, F_FS_INT, F_NO_ID, F_POS = 1, 2, 4, 8, 16, 32
+
+
+def align(n):
+	return (n+7)//8*8
+
+
+def isBinary(filename):
+	try:
+		with open(filename, 'rb') as f:
+			return f.read(len(MAGIC)) == MAGIC
+	except OSError:
+		return False
+
+
+def toBinary(data):
+	# sheet dict -> bytes
+	thoughts = data.get('thoughts', [])
+	links = data.get('links', [])
+
+	# thoughts/links stay in as placeholders to keep the key order
+	meta = {}
+	for k, v in data.items():
+		if k in ('thoughts', 'links'):
+			v = None
+		meta[k] = v
+	metaBytes = json.dumps(meta).encode('utf-8')
+
+	n = len(thoughts)
+	cols = [array('d') for i in range(4)] # x, y, radius, fontSize
+	ids = array('q')
+	textEnd = array('Q')
+	flags = bytearray(n)
+	strings = bytearray()
+
+	for i, t in enumerate(thoughts):
+		if 'pos' in t:
+			loc = t['pos']
+			flags[i] |= F_POS
+		else:
+			loc = t['pixLoc']
+
+		values = (loc[0], loc[1], t['radius'], t['fontSize'])
+		for c, (col, v) in enumerate(zip(cols, values)):
+			col.append(v)
+			if isinstance(v, int):
+				flags[i] |= (F_X_INT, F_Y_INT, F_R_INT, F_FS_INT)[c]
+
+		if 'id' in t:
+			ids.append(t['id'])
+		else:
+			ids.append(0)
+			flags[i] |= F_NO_ID
+
+		strings += t['text'].encode('utf-8')
+		textEnd.append(len(strings))
+
+	linkCols = [array('q') for i in range(3)] # tA, tB, importance
+	for l in links:
+		linkCols[0].append(l['tA'])
+		linkCols[1].append(l['tB'])
+		linkCols[2].append(l['importance'])
+
+	out = bytearray(HEADER.pack(MAGIC, VERSION, n, len(links), len(metaBytes)))
+	out += metaBytes
+
+	for col in cols+[ids, textEnd]+linkCols:
+		out += bytes(align(len(out))-len(out))
+		out += col.tobytes()
+
+	out += flags
+	out += strings
+
+	return bytes(out)
+
+
+class BinarySheet:
+
+	# read-only view of a .mms file through mmap. the numeric columns are
+	#   memoryviews straight into the file, texts get decoded on request
+
+	def __init__(self, filename):
+		with open(filename, 'rb') as f:
+			self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+		magic, version, self.numThoughts, self.numLinks, metaLen = HEADER.unpack_from(self.mm, 0)
+		if magic != MAGIC or version != VERSION:
+			raise ValueError("not a MindMap binary sheet: "+filename)
+
+		buf = memoryview(self.mm)
+		pos = HEADER.size
+
+		self.meta = json.loads(bytes(buf[pos:pos+metaLen]).decode('utf-8'))
+		pos += metaLen
+
+		def column(fmt, count):
+			nonlocal pos
+			pos = align(pos)
+			col = buf[pos:pos+8*count].cast(fmt)
+			pos += 8*count
+			return col
+
+		n, nl = self.numThoughts, self.numLinks
+		self.x = column('d', n)
+		self.y = column('d', n)
+		self.radius = column('d', n)
+		self.fontSize = column('d', n)
+		self.ids = column('q', n)
+		self.textEnd = column('Q', n)
+		self.tA = column('q', nl)
+		self.tB = column('q', nl)
+		self.importance = column('q', nl)
+
+		self.flags = buf[pos:pos+n]
+		self.stringStart = pos+n
+
+	def text(self, i):
+		start = self.textEnd[i-1] if i > 0 else 0
+		end = self.textEnd[i]
+		return self.mm[self.stringStart+start:self.stringStart+end].decode('utf-8')
+
+	def number(self, col, i, intFlag):
+		v = col[i]
+		if self.flags[i] & intFlag:
+			return int(v)
+		return v
+
+	def thought(self, i):
+		# the i-th (0-based) thought as it would appear in the json
+		tData = {}
+		if not self.flags[i] & F_NO_ID:
+			tData['id'] = self.ids[i]
+		posKey = 'pos' if self.flags[i] & F_POS else 'pixLoc'
+		tData[posKey] = [self.number(self.x, i, F_X_INT), self.number(self.y, i, F_Y_INT)]
+		tData['radius'] = self.number(self.radius, i, F_R_INT)
+		tData['text'] = self.text(i)
+		tData['fontSize'] = self.number(self.fontSize, i, F_FS_INT)
+		return tData
+
+	def link(self, i):
+		return {'tA':self.tA[i], 'tB':self.tB[i], 'importance':self.importance[i]}
+
+	def toData(self):
+		data = dict(self.meta)
+		data['thoughts'] = [self.thought(i) for i in range(self.numThoughts)]
+		data['links'] = [self.link(i) for i in range(self.numLinks)]
+		return data
+
+	def close(self):
+		# the column views have to go before the mmap can be closed
+		for name in ('x', 'y', 'radius', 'fontSize', 'ids', 'textEnd', 'tA', 'tB', 'importance', 'flags'):
+			getattr(self, name).release()
+		self.mm.close()
+
+
+def jsonWrite(data, filename):
+	utils.jsonSave(data=data, filename=filename, indent=True, sort=False, oneLine=False)
+
+def binaryWrite(data, filename):
+	utils.atomicWrite(filename, toBinary(data), mode='wb')
+
+def binaryLoad(filename):
+	sheet = BinarySheet(filename)
+	try:
+		return sheet.toData()
+	finally:
+		sheet.close()
+
+
+def formatOf(filename):
+	# existing files are recognized by their content, new ones by extension
+	if os.path.exists(filename):
+		if isBinary(filename):
+			return 'binary'
+		return 'json'
+
+	if filename.endswith(BINARY_EXT):
+		return 'binary'
+	return 'json'
+
+def load(filename):
+	# sheet dict from either format ({} if the file is missing/unreadable)
+	if isBinary(filename):
+		try:
+			return binaryLoad(filename)
+		except (OSError, ValueError):
+			return {}
+
+	return utils.jsonLoad(filename)
+
+def writerFor(fmt):
+	if fmt == 'binary':
+		return binaryWrite
+	return jsonWrite
+
+
+def convert(src, dst):
+	# lossless conversion between the two formats, direction picked from
+	#   the source file's content
+	data = load(src)
+	if data == {}:
+		raise ValueError("could not read sheet: "+src)
+
+	if isBinary(src):
+		jsonWrite(data, dst)
+	else:
+		binaryWrite(data, dst)
+
+
+if __name__ == "__main__":
+	# python3 sheetio.py Sheets/big.json Sheets/big.mms   (and back)
+	if len(sys.argv) != 3:
+		print("usage: python3 sheetio.py SOURCE DEST")
+		sys.exit(1)
+
+	convert(sys.argv[1], sys.argv[2])
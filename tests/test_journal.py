@@ -0,0 +1,168 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Journal import Journal, journalNames
+
+
+def snapshot():
+	return {
+		'root_geometry': "1000x500+0+0",
+		'thoughts': [
+			{'id':1, 'pos':[0, 0], 'radius':50, 'text':"one", 'fontSize':10},
+			{'id':2, 'pos':[100, 0], 'radius':50, 'text':"two", 'fontSize':10},
+			{'id':3, 'pos':[0, 100], 'radius':50, 'text':"three", 'fontSize':10},
+		],
+		'camera': {'offset':[0, 0], 'base':1.0, 'level':0},
+		'journalSeq': 0,
+		'links': [
+			{'tA':1, 'tB':2, 'importance':0},
+			{'tA':2, 'tB':3, 'importance':0},
+		],
+	}
+
+
+class JournalTest(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.filename = os.path.join(self.dir, 'sheet.json')
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def reopen(self, journal):
+		# what the next session sees
+		journal.close()
+		return Journal(self.filename)
+
+	def edit(self, journal):
+		journal.record('move', key=1, id=1, pos=[5, 5])
+		journal.record('move', key=1, id=1, pos=[7, 8]) # replaces the first
+		journal.record('text', key=2, id=2, text="TWO")
+		journal.record('add', id=4, pos=[50, 50], radius=30, text="four", fontSize=12)
+		journal.record('resize', key=4, id=4, radius=35, fontSize=14)
+		journal.record('remove', id=3)
+		journal.record('unlink', a=1, b=2)
+		journal.record('link', a=4, b=1, importance=1)
+		journal.record('camera', key='camera', camera={'offset':[3, 4], 'base':1.0, 'level':1})
+		journal.flush()
+
+	def expected(self):
+		data = snapshot()
+		data['thoughts'] = [
+			{'id':1, 'pos':[7, 8], 'radius':50, 'text':"one", 'fontSize':10},
+			{'id':2, 'pos':[100, 0], 'radius':50, 'text':"TWO", 'fontSize':10},
+			{'id':4, 'pos':[50, 50], 'radius':35, 'text':"four", 'fontSize':14},
+		]
+		# 1-2 was unlinked, 2-3 went with thought 3
+		data['links'] = [{'tA':3, 'tB':1, 'importance':1}]
+		data['camera'] = {'offset':[3, 4], 'base':1.0, 'level':1}
+		return data
+
+	def testReplay(self):
+		journal = Journal(self.filename)
+		self.edit(journal)
+
+		journal = self.reopen(journal)
+		data = journal.replay(snapshot())
+
+		expected = self.expected()
+		expected['journalSeq'] = journal.seq
+		self.assertEqual(data, expected)
+
+	def testSkipsWhatTheSnapshotHas(self):
+		journal = Journal(self.filename)
+		self.edit(journal)
+
+		data = snapshot()
+		data['journalSeq'] = journal.seq
+		self.assertEqual(self.reopen(journal).replay(data), data)
+
+	def testRotated(self):
+		# a snapshot written at rotate() time that never landed: the records
+		#   in .old still count
+		journal = Journal(self.filename)
+		journal.record('move', key=1, id=1, pos=[7, 8])
+		journal.rotate()
+		journal.record('text', key=2, id=2, text="TWO")
+		journal = self.reopen(journal)
+
+		data = journal.replay(snapshot())
+		self.assertEqual(data['thoughts'][0]['pos'], [7, 8])
+		self.assertEqual(data['thoughts'][1]['text'], "TWO")
+
+		journal.dropOld()
+		journal = self.reopen(journal)
+		self.assertEqual(journal.replay(snapshot())['thoughts'][0]['pos'], [0, 0])
+
+	def testSeqContinues(self):
+		journal = Journal(self.filename)
+		self.edit(journal)
+		lastSeq = journal.seq
+
+		journal = self.reopen(journal)
+		self.assertEqual(journal.seq, lastSeq)
+
+		# recorded before anything read the journal, must still come after
+		journal.record('move', key=2, id=2, pos=[1, 1])
+		journal.flush()
+		self.assertEqual(journal.seq, lastSeq+1)
+		self.assertEqual(self.reopen(journal).replay(snapshot())['thoughts'][1]['pos'], [1, 1])
+
+	def testIdReused(self):
+		# an id handed out again after its thought was removed (older
+		#   sessions did that) belongs to the new thought only
+		data = snapshot()
+		data['thoughts'] = data['thoughts'][:1]
+		data['links'] = []
+
+		journal = Journal(self.filename)
+		journal.record('add', id=2, pos=[0, 0], radius=30, text="first", fontSize=10)
+		journal.record('move', key=2, id=2, pos=[999, 999])
+		journal.record('link', a=1, b=2, importance=0)
+		journal.record('remove', id=2)
+		journal.flush()
+
+		journal = self.reopen(journal)
+		journal.record('add', id=2, pos=[5, 5], radius=30, text="second", fontSize=10)
+		journal.record('link', a=2, b=1, importance=1)
+		journal.flush()
+
+		data = self.reopen(journal).replay(data)
+		self.assertEqual(data['thoughts'][1], {'id':2, 'pos':[5, 5], 'radius':30, 'text':"second", 'fontSize':10})
+		self.assertEqual(data['links'], [{'tA':2, 'tB':1, 'importance':1}])
+
+	def testTornLine(self):
+		journal = Journal(self.filename)
+		self.edit(journal)
+		journal.close()
+
+		# crash in the middle of the next append
+		current, old = journalNames(os.path.basename(self.filename))
+		with open(os.path.join(self.dir, current), 'a') as f:
+			f.write('{"op": "move", "id": 2, "pos": [9')
+
+		journal = Journal(self.filename)
+		data = journal.replay(snapshot())
+
+		expected = self.expected()
+		expected['journalSeq'] = journal.seq
+		self.assertEqual(data, expected)
+
+		# the first change after the crash isn't lost with the torn line
+		journal.record('move', key=2, id=2, pos=[1, 1])
+		journal = self.reopen(journal)
+		data = journal.replay(snapshot())
+
+		expected['thoughts'][1]['pos'] = [1, 1]
+		expected['journalSeq'] = journal.seq
+		self.assertEqual(data, expected)
+
+
+if __name__ == '__main__':
+	unittest.main()
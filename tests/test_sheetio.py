@@ -0,0 +1,147 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import sheetio
+
+
+def sampleSheet():
+	# a bit of everything the formats have to keep: ints next to floats,
+	#   old style pixLoc thoughts, thoughts without an id, non-ascii text
+	return {
+		'root_geometry': "1000x500+0+0",
+		'thoughts': [
+			{'id':1, 'pos':[10, -20.5], 'radius':50, 'text':"plain", 'fontSize':10},
+			{'id':2, 'pos':[1e-3, 123456.75], 'radius':33.25, 'text':"", 'fontSize':12.5},
+			{'pixLoc':[400, 300], 'radius':60.0, 'text':"no id <<friday 10am>>", 'fontSize':8},
+			{'id':7, 'pos':[-5000, 5000], 'radius':40, 'text':"ünïcode ✓ #b3\nsecond line", 'fontSize':18},
+		],
+		'camera': {'offset':[12.5, -3], 'base':1.0, 'level':-2},
+		'journalSeq': 42,
+		'links': [
+			{'tA':1, 'tB':2, 'importance':0},
+			{'tA':2, 'tB':4, 'importance':1},
+			{'tA':4, 'tB':3, 'importance':0},
+		],
+	}
+
+
+class BinaryTest(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def load(self, raw):
+		fn = os.path.join(self.dir, 'sheet'+sheetio.BINARY_EXT)
+		with open(fn, 'wb') as f:
+			f.write(raw)
+
+		sheet = sheetio.BinarySheet(fn)
+		try:
+			return sheet.toData()
+		finally:
+			sheet.close()
+
+	def testRoundTrip(self):
+		data = sampleSheet()
+		raw = sheetio.toBinary(data)
+
+		back = self.load(raw)
+		self.assertEqual(back, data)
+		# same key order too, so the json written from it doesn't change
+		self.assertEqual(json.dumps(back), json.dumps(data))
+		# and the same bytes when written out again
+		self.assertEqual(sheetio.toBinary(back), raw)
+
+	def testEmpty(self):
+		data = {'root_geometry':"1000x500+0+0", 'thoughts':[], 'links':[]}
+		raw = sheetio.toBinary(data)
+		self.assertEqual(self.load(raw), data)
+		self.assertEqual(sheetio.toBinary(self.load(raw)), raw)
+
+
+class IterJsonTest(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def collect(self, fn, chunkSize):
+		# rebuild the dict from the streamed entries
+		data = {}
+		for kind, key, v in sheetio.iterJson(fn, chunkSize=chunkSize):
+			if kind == 'item':
+				data.setdefault(key, []).append(v)
+			else:
+				data[key] = v
+		return data
+
+	def testChunkSizes(self):
+		data = sampleSheet()
+		# enough thoughts that the bigger chunks get cut mid-value as well
+		for i in range(500):
+			data['thoughts'].append({'id':100+i, 'pos':[i*1.5, -i], 'radius':30+i%7, 'text':"t %d ✓" % i, 'fontSize':10})
+
+		for indent in (True, False):
+			fn = os.path.join(self.dir, 'sheet.json')
+			sheetio.utils.jsonSave(data, fn, indent=indent)
+			with open(fn) as f:
+				expected = json.load(f)
+
+			for chunkSize in (1, 2, 3, 7, 64, 1000, 4096, 1<<16):
+				with self.subTest(indent=indent, chunkSize=chunkSize):
+					self.assertEqual(self.collect(fn, chunkSize), expected)
+
+	def testFirstEventEarly(self):
+		# the first entries come out after a chunk or two, not once the
+		#   whole file has been read
+		data = sampleSheet()
+		for i in range(5000):
+			data['thoughts'].append({'id':100+i, 'pos':[i, i], 'radius':30, 'text':"t %d" % i, 'fontSize':10})
+
+		fn = os.path.join(self.dir, 'sheet.json')
+		sheetio.utils.jsonSave(data, fn)
+		self.assertGreater(os.path.getsize(fn), 100*1024)
+
+		reads = []
+		realOpen = open
+		def countingOpen(*args, **kwargs):
+			f = realOpen(*args, **kwargs)
+			read = f.read
+			def countedRead(size=-1):
+				reads.append(size)
+				return read(size)
+			f.read = countedRead
+			return f
+
+		with mock.patch('sheetio.open', countingOpen, create=True):
+			events = sheetio.iterJson(fn, chunkSize=1024)
+			self.assertEqual(next(events), ('value', 'root_geometry', "1000x500+0+0"))
+			self.assertLessEqual(len(reads), 2)
+
+			next(events) # first thought
+			self.assertLessEqual(len(reads), 2)
+			events.close()
+
+	def testTruncated(self):
+		fn = os.path.join(self.dir, 'sheet.json')
+		with open(fn, 'w') as f:
+			f.write(json.dumps(sampleSheet())[:-20])
+
+		with self.assertRaises(ValueError):
+			self.collect(fn, 16)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import utils
+from TimeParser import TimeParser
+
+
+class ParseSecondsTest(unittest.TestCase):
+
+	def testFixed(self):
+		expected = int(time.mktime((2026, 10, 18, 14, 0, 0, 0, 0, -1)))
+		self.assertEqual(utils.parseSeconds("14:00 18/10/2026"), expected)
+
+	def testRelative(self):
+		now = time.time()
+		secs = utils.parseSeconds("in 2 hours")
+		self.assertAlmostEqual(secs-now, 2*3600, delta=5)
+
+	def testNotATime(self):
+		# ignored, rather than taken as now
+		self.assertIsNone(utils.parseSeconds("banana"))
+		self.assertIsNone(utils.parseSeconds("ab:cd 1/2"))
+		self.assertIsNone(utils.parseTime("banana"))
+
+		# also when it comes out of the cache
+		self.assertIsNone(utils.parseSeconds("banana"))
+
+
+class TimeParserTest(unittest.TestCase):
+
+	def testOffsetMoves(self):
+		parser = TimeParser()
+		now = time.time()
+		a, worked = parser.parseSeconds("in 2 hours", now)
+		b, worked = parser.parseSeconds("in 2 hours", now+600)
+		self.assertTrue(worked)
+		self.assertEqual(b-a, 600)
+
+	def testWeekdayNotKeptForever(self):
+		parser = TimeParser()
+		now = time.time()
+		a, worked = parser.parseSeconds("friday 10am", now)
+		b, worked = parser.parseSeconds("friday 10am", now+7*86400)
+		self.assertEqual(b-a, 7*86400)
+
+
+if __name__ == '__main__':
+	unittest.main()
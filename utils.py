@@ -1,21 +1,55 @@
 import tkinter as tk
 from PIL import ImageTk, Image
-import datetime
-import parsedatetime
+import time
 import math
 import json
+import os
+import tempfile
 
-
-def jsonSave(data, filename, indent=True, sort=False, oneLine=False):
-	f = open(filename, 'w')
+from TimeParser import TimeParser
 
 
+def jsonSave(data, filename, indent=True, sort=False, oneLine=False):
 	if indent:
-		f.write(json.dumps(data, indent=4, sort_keys=sort))
+		text = json.dumps(data, indent=4, sort_keys=sort)
 	else:
-		f.write(json.dumps(data, sort_keys=sort))
+		text = json.dumps(data, sort_keys=sort)
+
+	atomicWrite(filename, text)
+
+def atomicWrite(filename, content, mode='w'):
+	# write to a temp file next to the target, fsync it and rename it over
+	#   the target, so a crash mid-write never leaves a truncated file behind
+	directory = os.path.dirname(os.path.abspath(filename))
+
+	# keep the permissions of the file being replaced (mkstemp uses 0600)
+	try:
+		perms = os.stat(filename).st_mode & 0o777
+	except OSError:
+		perms = 0o644
 
-	f.close()
+	fd, tmpName = tempfile.mkstemp(dir=directory, prefix='.'+os.path.basename(filename)+'.', suffix='.tmp')
+	try:
+		os.fchmod(fd, perms)
+		with os.fdopen(fd, mode) as f:
+			f.write(content)
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(tmpName, filename)
+	except:
+		if os.path.exists(tmpName):
+			os.remove(tmpName)
+		raise
+
+	# make the rename itself durable
+	try:
+		dirFd = os.open(directory, os.O_RDONLY)
+		try:
+			os.fsync(dirFd)
+		finally:
+			os.close(dirFd)
+	except OSError:
+		pass
 
 def jsonLoad(filename):
 	try:
@@ -143,12 +177,40 @@ def loadImage(filename, size, imageList, root, background=None):
 
 
 
+def fontSize(size):
+	# integer font size for a zoomed one. 1pt steps for normal sizes, ~6%
+	#   steps for big ones, so zooming in doesn't keep making new fonts
+	if size < 32:
+		return max(1, int(size))
+	step = 2**int(math.log(size, 2))/16.0
+	return int(size//step*step)
+
+def timeTag(text):
+	# what's between << and >> in a thought's text, None if there isn't a tag
+	start = text.find('<<')
+	end = text.find('>>')
+
+	# make sure the order is << then >>
+	if start == -1 or end == -1 or end-start <= 3:
+		return None
+
+	return text[start+2:end].strip()
+
 def parseTime(inStr):
+	# time vector version of parseSeconds
+	secs = parseSeconds(inStr)
+	if secs is None:
+		return None
+	return fromSeconds(secs)
+
+def parseSeconds(inStr):
 
-	# string should be of form h:m day/month/year
+	# string should be of form h:m day/month/year, or anything
+	#   parsedatetime understands. returns epoch seconds, or None if it
+	#   isn't a time (so the tag gets ignored rather than showing now)
 
 	if len(inStr) <= 1:
-		return getTimeVec("now")
+		return int(time.time())
 
 	try:
 		if ':' in inStr and '/' in inStr:
@@ -158,127 +220,92 @@ def parseTime(inStr):
 			hour, minute = int(hour), int(minute)
 
 			if parts[1]=="today":
-				today = getTimeVec("now")
-				day, month, year = today['day'], today['month'], today['year']
+				today = time.localtime()
+				day, month, year = today.tm_mday, today.tm_mon, today.tm_year
 			else:
 				day, month, year = parts[1].split('/')
 				day, month, year = int(day), int(month), int(year)
 
-			return {"year":year, "month":month, "day":day, "hour":hour, "minute":minute, "second":0, "worked":True}
+			return int(time.mktime((year, month, day, hour, minute, 0, 0, 0, -1)))
 		else:
 			# see if we can try parse natural language
-			return getTimeVec(inStr)
+			secs, worked = timeParser.parseSeconds(inStr)
+			if not worked:
+				return None
+			return secs
 	except:
 		print("time parsing error")
-		return getTimeVec("now")
-
-def timeDiff(T1, T2=[], short=False):
-
-	# takes output from getTimeVec()
-
-	# [TD["year"], TD["month"],TD["day"],TD["hour"],TD["minute"],TD["second"]]
+		return None
 
-	# note: months start at 1 (not zero)
+# (amount, short name, long name), biggest first
+timeUnits = [(86400, "d", "day"), (3600, "h", "hour"), (60, "m", "minute"), (1, "s", "second")]
 
-	T2p = []
-	if T2 == []:
-		T2 = getTimeVec("now")
-	
-	T2p = datetime.datetime(year = T2['year'], month=T2['month'], day=T2['day'], hour=T2['hour'], minute=T2['minute'], second=T2['second'])
-	T1p = datetime.datetime(year = T1['year'], month=T1['month'], day=T1['day'], hour=T1['hour'], minute=T1['minute'], second=T1['second'])
+def splitSeconds(d):
+	# d (>= 0) -> [(count, unit), ...] for the units of timeUnits
+	parts = []
+	for unit in timeUnits:
+		v, d = divmod(d, unit[0])
+		parts.append((v, unit))
+	return parts
 
-	T1TotalSecs = (T1p-datetime.datetime(1970,1,1)).total_seconds()
-	T2TotalSecs = (T2p-datetime.datetime(1970,1,1)).total_seconds()
+def formatDiff(secs, now=None, short=False):
+	# how far epoch time secs is from now, "- 2h 5m" / "in 2 hours 5 minutes"
+	#   for the future and "+ 2h 5m" / "2 hours 5 minutes ago" for the past
+	if now is None:
+		now = time.time()
+	secs, now = int(secs), int(now)
 
-	T1InFuture = (T1TotalSecs > T2TotalSecs)
+	inFuture = secs > now
+	parts = [(v, unit) for v, unit in splitSeconds(abs(secs-now)) if v != 0]
 
-	#print "T1:", T1
-
-	#if T1InFuture:
-	#	print "T1 in future"
-
-	tDiff = 0
-	if T1InFuture:
-		tDiff = T1TotalSecs - T2TotalSecs
+	if short:
+		# only the two biggest
+		diffStr = ''.join(' %s%s'%(v, unit[1]) for v, unit in parts[:2])
+		diffStr = ("-" if inFuture else "+")+diffStr
 	else:
-		tDiff = T2TotalSecs - T1TotalSecs
+		diffStr = ''.join(' %s %s%s'%(v, unit[2], '' if v == 1 else 's') for v, unit in parts)
+		diffStr = "in"+diffStr if inFuture else diffStr+" ago"
 
-	daysDiff = math.floor(tDiff/(86400.0))
-	tDiff = tDiff - 86400.0*daysDiff
-
-	hoursDiff = math.floor(tDiff/(3600.0))
-	tDiff = tDiff - 3600.0*hoursDiff
-
-	minutesDiff = math.floor(tDiff/(60.0))
-	tDiff = tDiff - 60.0*minutesDiff
+	return diffStr.strip()
 
-	secondsDiff = tDiff#math.floor(tDiff/(60))
-	#tDiff = tDiff - 60.0*hoursDiff
+def nextChange(secs, now=None, short=True):
+	# seconds until formatDiff(secs, short=short) next gives a different string
 
-	#print daysDiff, "days"
-	#print hoursDiff, "hours"
-	#print minutesDiff, "minutes"
-	#print secondsDiff, "seconds"
+	if now is None:
+		now = time.time()
+	frac = now-int(now)
+	diff = int(secs)-int(now)
 
-	# combine values into str
+	d = abs(diff)
 
-	diffStr=""
+	# the short string shows the two biggest non zero units, so it only
+	#   changes when the smaller of those does. with less than two shown
+	#   (e.g. "-2d") it can change any second. the long one shows seconds
+	#   whenever there are any, so it always changes every second
+	shown = [unit[0] for v, unit in splitSeconds(d) if v != 0][:2]
+	step = shown[-1] if short and len(shown) == 2 else 1
 
-	if short:
-		numStr=0
-		if daysDiff != 0:
-			if numStr < 2:
-				diffStr += (' %s'%int(daysDiff))+"d"
-				numStr += 1
-		if hoursDiff != 0:
-			if numStr < 2:
-				diffStr += (' %s'%int(hoursDiff))+"h"
-				numStr += 1
-		if minutesDiff != 0:
-			if numStr < 2:
-				diffStr += (' %s'%int(minutesDiff))+"m"
-				numStr += 1
-		if secondsDiff != 0:
-			if numStr < 2:
-				diffStr += (' %s'%int(secondsDiff))+"s"
-				numStr += 1
+	if diff > 0:
+		# counting down, changes once d drops below the current multiple
+		wait = d - step*(d//step) + 1
 	else:
+		wait = step - d%step
 
-		if daysDiff != 0:
-			if daysDiff == 1:
-				diffStr += (' %s'%int(daysDiff))+" day"
-			else:
-				diffStr += (' %s'%int(daysDiff))+" days"
-		if hoursDiff != 0:
-			if hoursDiff == 1:
-				diffStr += (' %s'%int(hoursDiff))+" hour"
-			else:
-				diffStr += (' %s'%int(hoursDiff))+" hours"
-		if minutesDiff != 0:
-			if minutesDiff == 1:
-				diffStr += (' %s'%int(minutesDiff))+" minute"
-			else:
-				diffStr += (' %s'%int(minutesDiff))+" minutes"
-		if secondsDiff != 0:
-			if secondsDiff == 1:
-				diffStr += (' %s'%int(secondsDiff))+" second"
-			else:
-				diffStr += (' %s'%int(secondsDiff))+" seconds"
+	# until the second ticks over, plus a bit so we land after it
+	return wait - frac + 0.05
 
-	if T1InFuture:
-		if short:
-			diffStr = "-"+diffStr
-		else:
-			diffStr = "in"+diffStr
-	else:
-		if short:
-			diffStr = "+"+diffStr
-		else:
-			diffStr = diffStr+" ago"
+def toSeconds(T):
+	# time vector (see getTimeVec) -> epoch seconds
+	return int(time.mktime((T['year'], T['month'], T['day'], T['hour'], T['minute'], T['second'], 0, 0, -1)))
 
-	#print "DIFFSTR:", diffStr.strip()
+def fromSeconds(secs):
+	# epoch seconds -> time vector
+	T = time.localtime(secs)
+	return {"year":T[0], "month":T[1], "day":T[2], "hour":T[3], "minute":T[4], "second":T[5], "worked":True}
 
-	return diffStr.strip()
+def timeDiff(T1, T2=[], short=False):
+	# time vector version of formatDiff, T2 defaults to now
+	return formatDiff(toSeconds(T1), toSeconds(T2) if T2 != [] else None, short=short)
 
 def toDict(T):
 	# [TD["year"], TD["month"],TD["day"],TD["hour"],TD["minute"],TD["second"]]
@@ -290,64 +317,14 @@ def toDict(T):
 	return TD
 
 def secondsDiff(T1, T2):
-	T2p = datetime.datetime(year = T2['year'], month=T2['month'], day=T2['day'], hour=T2['hour'], minute=T2['minute'], second=T2['second'])
-	T1p = datetime.datetime(year = T1['year'], month=T1['month'], day=T1['day'], hour=T1['hour'], minute=T1['minute'], second=T1['second'])
-
-	T1TotalSecs = (T1p-datetime.datetime(1970,1,1)).total_seconds()
-	T2TotalSecs = (T2p-datetime.datetime(1970,1,1)).total_seconds()
-
-	return T1TotalSecs - T2TotalSecs
-
-def fixStr(inStr):
-	inStr = inStr.lower()
+	return toSeconds(T1) - toSeconds(T2)
 
-	if "from now" not in inStr and "in " in inStr:
-		inStr = inStr.replace("in ", " ")
-		inStr = inStr+" from now"
-
-	inStr = inStr.replace("by ", " ")
-	inStr = inStr.replace("a little while", "10 minutes")
-	inStr = inStr.replace("a while", "30 minutes")
-	inStr = inStr.replace("a couple", "2")
-	inStr = inStr.replace("a few", "3")
-	inStr = inStr.replace("some time", "2 hours")
-	inStr = inStr.replace("several", "6")
-	inStr = inStr.replace("midnight", "11:59 pm")
-	inStr = inStr.replace("soon", "30 minutes from now")
-
-	inStr = inStr.replace("half hour", "30 minutes")
-	inStr = inStr.replace("half an hour", "30 minutes")
-	inStr = inStr.replace("half a day", "12 hours")
-
-	return inStr
+# one parser (and parsedatetime Calendar) for everything
+timeParser = TimeParser()
 
 def getTimeVec(inStr):
-	cal = parsedatetime.Calendar()
-	[T, worked] = cal.parse(fixStr(inStr))
-
-	T  = [item for item in T]
-
-	#if worked == 0:
-	#	print "PARSE FAILED"
-
-	#time.struct_time(tm_year=2015, tm_mon=7, tm_mday=3, tm_hour=4, tm_min=6, tm_sec=36, tm_wday=4, tm_yday=184, tm_isdst=-1)
-
-	Year = T[0]
-	Month = T[1]
-	DayOfMonth = T[2]
-	Hour24 = T[3]
-	Minute = T[4]
-	Second = T[5]
-	Weekday = T[6]
-	DayOfYear = T[7]
-
-	#NOW = cal.parse("now")
-
-	return {"year":Year, "month":Month, "day":DayOfMonth, "hour":Hour24, "minute":Minute, "second":Second, "worked":worked!=0}
-
-
-
-
+	# see TimeParser.py
+	return timeParser.parse(inStr)
 
 
 def dist(p1, p2):
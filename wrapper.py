@@ -3,33 +3,34 @@ from tkinter import messagebox
 import sys
 import subprocess
 import math
-import threading
 import ColourScheme as cs
 import time
 import os
 
 import settings
+import sheetio
 from utils import toHex, shadeN
 from ColourScheme import *
+from Animator import Animator
+from Agenda import Agenda, describe
+from FontRegistry import FontRegistry
+from Journal import journalNames
 
 
 addLabelGeom=[0,0,0,0,0]
 
+# fonts of the tiles at the current layout, see resize_layout
+layoutFonts=[]
+
 
 
 def addEnter(event=[]):
 
 	return
 
-def addLeave(event=[], stage=0):
-
-	#try:
-
-	total_stages=20
+def addLeave(event=[]):
 
-	f = 1.0*stage/total_stages
-	
-	if stage<=total_stages:
+	def step(f):
 		bgColour = shadeN([(1.0,1.0,1.0), cs.background], [0,1], f)
 		textColour = shadeN([cs.darkText, cs.lightText], [0,1], f)
 
@@ -38,15 +39,12 @@ def addLeave(event=[], stage=0):
 
 		tk_text.configure(fg=toHex(fontColour), bg=toHex(bgColour))#toHex(textColour))
 
-
-	if stage < total_stages:
-		t = threading.Timer(0.01, addLeave, [[], stage+1])
-		t.daemon = True
-		t.start()
-	else:
+	def done():
 		tk_text.place(x=-1, y=-1,width=0, height=0)
 		tk_root.focus()
 
+	animator.animate(0.2, step, target=tk_text, done=done)
+
 def addFile(event=[]):
 	global sheets, addLabelGeom, tk_text
 
@@ -100,9 +98,13 @@ def sheetRightClick(sheet, event=[]):
 		print("deleting ", filename)
 
 
-		cmd = 'rm '+filename
-
-		subprocess.call(cmd+" >/dev/null 2>&1 &", shell=True)
+		# the journals too, or a new sheet of the same name would replay them
+		directory, name = os.path.split(filename)
+		for fn in (name,)+journalNames(name):
+			try:
+				os.remove(os.path.join(directory, fn))
+			except OSError:
+				pass
 
 		# now need to redraw window
 		init_pages()
@@ -115,50 +117,80 @@ def labelEnter(sheet, event=[]):
 def labelLeave(sheet, event=[]):
 	#sheet.configure(bg=toHex(cs.background), fg="white")
 
-	pulse(sheet, stage=0)
+	pulse(sheet)
 
 
-def pulse(sheet, stage=0):
+def pulse(sheet):
 
-	try:
+	lightFontColour = shadeN([cs.background, cs.lightText], [0,1], cs.fontOpacity)
+	darkFontColour = shadeN([(1,1,1), cs.darkText], [0,1], cs.fontOpacity)
 
-		total_stages=20
+	def step(f):
+		sheetColour = shadeN([(1,1,1), cs.background], [0,1], f)
 
-		f = 1.0*stage/total_stages
-		
-		lightFontColour = shadeN([cs.background, cs.lightText], [0,1], cs.fontOpacity)
-		darkFontColour = shadeN([(1,1,1), cs.darkText], [0,1], cs.fontOpacity)
+		textColour = shadeN([darkFontColour, lightFontColour], [0,1], f)
 
-		if stage<=total_stages:
-			sheetColour = shadeN([(1,1,1), cs.background], [0,1], f)
+		try:
+			sheet.configure(bg=toHex(sheetColour), fg=toHex(textColour))
+		except tk.TclError:
+			# label got destroyed (see init_pages)
+			pass
 
-			
+	animator.animate(0.2, step, target=sheet)
 
-			textColour = shadeN([darkFontColour, lightFontColour], [0,1], f)
 
+def agendaTile(font_colour):
+	a_box = tk.Label(tk_root, text='agenda', font=settings.FONT, bg=toHex(cs.background), fg=font_colour, cursor='hand1', anchor=tk.CENTER)
+	a_box.bind('<Button-1>', showAgenda)
+	a_box.bind('<Enter>', lambda event, sheet=a_box: labelEnter(sheet, event))
+	a_box.bind('<Leave>', lambda event, sheet=a_box: labelLeave(sheet, event))
+	return a_box
 
-			sheet.configure(bg=toHex(sheetColour), fg=toHex(textColour))
+def showAgenda(event=[]):
+	# time tags of all sheets, click one to open its sheet
+	agenda.update()
+	now = time.time()
+
+	tk_agenda.configure(state='normal')
+	tk_agenda.delete('1.0', 'end')
+	for tag in tk_agenda.tag_names():
+		if tag.startswith('item'):
+			tk_agenda.tag_delete(tag)
 
+	tk_agenda.insert('end', 'agenda (esc to close)\n')
 
-		if stage < total_stages:
-			t = threading.Timer(0.01, pulse, [sheet, stage+1])
-			t.daemon = True
-			t.start()
-	except:
-		pass
+	for title, items in (('overdue', agenda.overdue(now)), ('upcoming', agenda.upcoming(now))):
+		tk_agenda.insert('end', '\n'+title+'\n')
+		if not items:
+			tk_agenda.insert('end', '  nothing\n')
+
+		for item in items:
+			tag = 'item%s' % tk_agenda.index('end')
+			tk_agenda.insert('end', '  '+describe(item, now)+'\n', tag)
+			tk_agenda.tag_bind(tag, '<Button-1>', lambda event, filename=agenda.filename(item[1]): sheetClick(filename, event))
+
+	tk_agenda.configure(state='disabled')
+	tk_agenda.place(x=0, y=0, relwidth=1, relheight=1)
+	tk_agenda.focus()
+
+def hideAgenda(event=[]):
+	tk_agenda.place_forget()
+	tk_root.focus()
 
 
 def get_sheet_list():
 	flines = os.listdir(settings.SRC_DIR+'/Sheets/')
 	files = []
 	for name in flines:
+		# skip hidden files (e.g. temp files left by an interrupted save)
+		if name.startswith('.'): continue
 		filename = settings.SRC_DIR+'/Sheets/'+name
-		namestr = name.replace('.json','')
+		namestr = name.replace('.json','').replace(sheetio.BINARY_EXT,'')
 		files.append({'filename':filename, 'name':namestr})
 	return files
 
 def resize_layout(event=[]):
-	global tk_sheets, addLabelGeom
+	global tk_sheets, addLabelGeom, layoutFonts
 
 	pixelX=tk_root.winfo_width()
 	pixelY=tk_root.winfo_height()
@@ -175,16 +207,23 @@ def resize_layout(event=[]):
 
 	fontSize = int(50.0*min(pixelX, pixelY)/(500.0*gridSide))
 
+	# all tiles share two fonts, the ones of the previous size can go
+	oldFonts = layoutFonts
+	layoutFonts = [(settings.MAIN_FONT, fontSize, "bold"), (settings.MAIN_FONT, fontSize*4, "bold")]
+	tileFont, plusFont = [fonts.acquire(f) for f in layoutFonts]
+	for f in oldFonts:
+		fonts.release(f)
+
 	for tks in tk_sheets:
 		loc = ((pos%gridSide)*gridWidth, math.floor(pos/gridSide)*gridHeight)
 		
 		tks.place(x=loc[0], y=loc[1], width=gridWidth, height=gridHeight)
 		if tks.cget('text')=='+':
-			tks.configure(font=(settings.MAIN_FONT, fontSize*4, "bold"))
+			tks.configure(font=plusFont)
 			addLabelGeom=[loc[0], loc[1], gridWidth, gridHeight, fontSize]
 		else:
 
-			tks.configure(font=(settings.MAIN_FONT, fontSize, "bold"))
+			tks.configure(font=tileFont)
 		pos +=1
 
 
@@ -203,6 +242,7 @@ def init_pages():
 
 	# destroy any sheets in list so that we can update it (ex. after deletion)
 	for s in tk_sheets:
+		animator.cancel(s)
 		s.destroy()
 
 
@@ -224,6 +264,8 @@ def init_pages():
 		
 		tk_sheets.append(s_box)
 
+	tk_sheets.append(agendaTile(font_colour))
+
 	s_box_plus = tk.Label(tk_root, text='+', font=settings.FONT, bg=toHex(cs.background), fg=font_colour, cursor='hand1', anchor=tk.CENTER)
 	s_box_plus.bind('<Button-1>', addFile)
 	s_box_plus.bind('<Enter>', lambda event, sheet=s_box_plus: labelEnter(sheet, event))
@@ -239,10 +281,22 @@ if __name__ == "__main__":
 
 	tk_root = tk.Tk()
 
+	# fades run from here, on the Tk thread
+	animator = Animator(tk_root)
+
+	fonts = FontRegistry(tk_root)
+
 	graphics_init(cs)
 
 	tk_root.bind("<Configure>", resize_layout)
 
+	# time tags across all sheets (see Agenda.py)
+	agenda = Agenda()
+
+	tk_agenda = tk.Text(tk_root, bd=0, highlightthickness=0, cursor='hand1', font=(settings.MAIN_FONT, 12),
+		bg=toHex(cs.background), fg=toHex(shadeN([cs.background, cs.lightText], [0,1], cs.fontOpacity)))
+	tk_agenda.bind('<Escape>', hideAgenda)
+
 	
 
 	# create list of files on canvas
@@ -261,6 +315,8 @@ if __name__ == "__main__":
 		
 		tk_sheets.append(s_box)
 
+	tk_sheets.append(agendaTile(font_colour))
+
 	s_box_plus = tk.Label(tk_root, text='+', font=settings.FONT, bg=toHex(cs.background), fg=font_colour, cursor='hand1', anchor=tk.CENTER)
 	s_box_plus.bind('<Button-1>', addFile)
 	s_box_plus.bind('<Enter>', lambda event, sheet=s_box_plus: labelEnter(sheet, event))